@@ -7,11 +7,14 @@
     "website": "https://www.indexa.do",
     "category": "Accounting",
     "license": "LGPL-3",
-    "version": "15.0.1.0.0",
-    "depends": ["account"],
+    "version": "15.0.1.4.0",
+    "depends": ["account", "l10n_do_external_service"],
     "data": [
+        "security/ir.model.access.csv",
         "data/ir_cron_data.xml",
         "data/ir_config_parameter_data.xml",
+        "views/currency_backfill_views.xml",
+        "views/currency_rates_push_views.xml",
         "views/res_config_settings_views.xml",
     ],
     "demo": [
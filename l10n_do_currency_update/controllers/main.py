@@ -0,0 +1,115 @@
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+
+from odoo import fields, http
+from odoo.http import request
+from odoo.tools import consteq
+
+from odoo.addons.l10n_do_external_service.tools import decoders
+
+SIGNATURE_HEADER = "X-Indexa-Signature"
+TIMESTAMP_HEADER = "X-Indexa-Timestamp"
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Seconds a signed push is accepted after, or before, its timestamp
+SIGNATURE_TOLERANCE = 300
+# Days before today a pushed rates date can be
+MAX_DATE_AGE = 366
+
+
+def _sign(secret, timestamp, key, body):
+    message = ("%s.%s." % (timestamp, key)).encode() + body
+    return "sha256=" + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class CurrencyRatesWebhook(http.Controller):
+    def _json_response(self, body, status=200):
+        response = request.make_response(
+            json.dumps(body), headers=[("Content-Type", "application/json")]
+        )
+        response.status_code = status
+        return response
+
+    @http.route(
+        "/l10n_do_currency_update/rates",
+        type="http",
+        auth="none",
+        methods=["POST"],
+        csrf=False,
+    )
+    def push_rates(self, **kwargs):
+        """
+        Receive the rates of a bank, in the rates service format plus their
+        bank and date. Eg:
+        {"bank": "bpd", "date": "2021-10-22", "status": "success",
+         "data": [{"name": "dollarsellrate", "rate": "58.2"}]}
+
+        The request must carry an Idempotency-Key header and the current
+        unix time in the X-Indexa-Timestamp header, both signed with the
+        body using the indexa.webhook.secret parameter: HMAC-SHA256 hex
+        digest of "<timestamp>.<key>.<body>" in the X-Indexa-Signature
+        header prefixed with sha256=. Disabled until the secret is set.
+        """
+        if not request.db:
+            return request.not_found()
+        secret = (
+            request.env["ir.config_parameter"]
+            .sudo()
+            .get_param("indexa.webhook.secret")
+        )
+        if not secret:
+            return request.not_found()
+
+        headers = request.httprequest.headers
+        body = request.httprequest.get_data()
+        timestamp = headers.get(TIMESTAMP_HEADER, "")
+        key = headers.get(IDEMPOTENCY_HEADER, "")
+        signature = headers.get(SIGNATURE_HEADER, "")
+        if not consteq(signature, _sign(secret, timestamp, key, body)):
+            return self._json_response(
+                {"status": "error", "message": "Invalid signature"}, 401
+            )
+        if not key:
+            message = "Missing %s header" % IDEMPOTENCY_HEADER
+            return self._json_response({"status": "error", "message": message}, 400)
+        try:
+            expired = abs(time.time() - int(timestamp)) > SIGNATURE_TOLERANCE
+        except ValueError:
+            expired = True
+        if expired:
+            return self._json_response(
+                {"status": "error", "message": "Expired signature"}, 401
+            )
+
+        try:
+            response = decoders.decode_rates(body)
+            payload = decoders.loads(body)
+            date = fields.Date.to_date(payload.get("date"))
+        except (TypeError, ValueError) as e:
+            return self._json_response({"status": "error", "message": str(e)}, 400)
+        provider = payload.get("bank")
+        Company = request.env["res.company"]
+        providers = dict(Company._fields["l10n_do_currency_provider"].selection)
+        if provider not in providers or not date:
+            return self._json_response(
+                {"status": "error", "message": "Unknown bank or date"}, 400
+            )
+        # A day ahead is allowed, banks publish next day rates in the evening
+        today = fields.Date.today()
+        if not today - timedelta(days=MAX_DATE_AGE) <= date <= today + timedelta(1):
+            return self._json_response(
+                {"status": "error", "message": "Date out of range"}, 400
+            )
+
+        Push = request.env["l10n_do.currency.rates.push"].sudo()
+        push, duplicated = Push._ingest(key, provider, date, response)
+        return self._json_response(
+            {
+                "status": "duplicated" if duplicated else "success",
+                "companies": len(push.company_ids),
+                "rates": push.rate_count,
+            }
+        )
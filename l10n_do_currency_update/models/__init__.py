@@ -1,2 +1,5 @@
 from . import res_config_settings
 from . import res_company
+from . import res_currency
+from . import currency_backfill
+from . import currency_rates_push
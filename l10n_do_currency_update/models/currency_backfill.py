@@ -0,0 +1,197 @@
+#  Copyright (c) 2018 - Indexa SRL. (https://www.indexa.do) <info@indexa.do>
+#  See LICENSE file for full licensing details.
+
+import logging
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+from odoo.tools import split_every
+
+from .res_company import _decode_currency_rates
+
+_logger = logging.getLogger(__name__)
+
+
+def _provider_selection(self):
+    return self.env["res.company"]._fields["l10n_do_currency_provider"].selection
+
+
+class CurrencyBackfill(models.Model):
+    _name = "l10n_do.currency.backfill"
+    _description = "Currency Rates Backfill"
+    _order = "id desc"
+
+    name = fields.Char(compute="_compute_name", store=True)
+    provider = fields.Selection(_provider_selection, string="Bank", required=True)
+    company_ids = fields.Many2many(
+        "res.company",
+        string="Companies",
+        required=True,
+        default=lambda self: self.env.company,
+    )
+    date_from = fields.Date(required=True)
+    date_to = fields.Date(required=True, default=fields.Date.context_today)
+    chunk_size = fields.Integer(
+        default=31,
+        help="Days fetched between two commits.",
+    )
+    checkpoint_date = fields.Date(
+        readonly=True,
+        help="Last day already stored. An interrupted backfill resumes after it.",
+    )
+    state = fields.Selection(
+        [
+            ("draft", "Draft"),
+            ("queued", "Queued"),
+            ("running", "Running"),
+            ("done", "Done"),
+        ],
+        default="draft",
+        readonly=True,
+    )
+    missing_days = fields.Integer(
+        readonly=True,
+        help="Days the provider returned no rates for.",
+    )
+
+    @api.depends("provider", "date_from", "date_to")
+    def _compute_name(self):
+        providers = dict(_provider_selection(self))
+        for backfill in self:
+            backfill.name = "%s: %s - %s" % (
+                providers.get(backfill.provider, ""),
+                backfill.date_from or "",
+                backfill.date_to or "",
+            )
+
+    @api.constrains("date_from", "date_to")
+    def _check_dates(self):
+        for backfill in self:
+            if backfill.date_from > backfill.date_to:
+                raise ValidationError(_("Date From must be before Date To."))
+            if backfill.date_to > fields.Date.context_today(backfill):
+                raise ValidationError(_("Rates can't be fetched for future dates."))
+
+    def action_start(self):
+        self.write({"state": "queued"})
+        self.env.ref("l10n_do_currency_update.ir_cron_currency_backfill")._trigger()
+
+    def action_reset(self):
+        self.write({"state": "draft", "checkpoint_date": False, "missing_days": 0})
+
+    def _iter_pending_dates(self):
+        self.ensure_one()
+        date = self.date_from
+        if self.checkpoint_date:
+            date = self.checkpoint_date + timedelta(days=1)
+        while date <= self.date_to:
+            yield date
+            date += timedelta(days=1)
+
+    def _iter_provider_rates(self, dates):
+        """
+        Fetch the provider rates of every date, keeping at most
+        indexa.api.workers requests in flight.
+
+        :param dates: iterable of dates
+        :return: generator of (date, decoders.RatesResponse) in dates order,
+        the response being None when its request failed
+        """
+        self.ensure_one()
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        api_url = get_param("indexa.api.url")
+        token = get_param("indexa.api.token")
+        max_workers = int(get_param("indexa.api.workers", 4))
+        client = self.env["l10n_do.external.service"]._get_http_client("rates")
+        # Read before starting the threads, they must not use the env cursor
+        provider = self.provider
+
+        def fetch(provider, date):
+            params = {"bank": provider, "date": fields.Date.to_string(date)}
+            try:
+                response = client.get(
+                    api_url, params, headers={"x-access-token": token}
+                )
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                _logger.warning("Rates of %s for %s failed: %s", provider, date, e)
+                return None
+            return _decode_currency_rates(response.text)
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            pending = deque()
+            for date in dates:
+                pending.append((date, executor.submit(fetch, provider, date)))
+                if len(pending) >= max_workers * 2:
+                    date, future = pending.popleft()
+                    yield date, future.result()
+            while pending:
+                date, future = pending.popleft()
+                yield date, future.result()
+
+    def _run(self):
+        """
+        Stream the provider rates of the pending dates into
+        res.currency.rate, committing and saving a checkpoint every
+        chunk_size days. When a request fails, the days fetched before it
+        are stored and the backfill stays running, so the next cron run
+        resumes from the failed day.
+        """
+        self.ensure_one()
+        self.state = "running"
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+
+        Company = self.env["res.company"]
+        currencies = Company._l10n_do_get_mapped_currencies()
+        responses = self._iter_provider_rates(self._iter_pending_dates())
+        for chunk in split_every(max(self.chunk_size, 1), responses):
+            rate_values = {}
+            missing_days = 0
+            checkpoint_date = failed_date = False
+            for date, response in chunk:
+                if response is None:
+                    failed_date = date
+                    break
+                checkpoint_date = date
+                if not response.rates:
+                    missing_days += 1
+                    continue
+                for company in self.company_ids:
+                    rates = company._l10n_do_parse_currency_rates(response, currencies)
+                    for currency_id, rate in rates.items():
+                        rate_values[(date, currency_id.id, company.id)] = rate
+
+            Company._l10n_do_upsert_currency_rates(rate_values)
+            if checkpoint_date:
+                self.write(
+                    {
+                        "checkpoint_date": checkpoint_date,
+                        "missing_days": self.missing_days + missing_days,
+                    }
+                )
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            if failed_date:
+                _logger.warning(
+                    "Backfill %s interrupted at %s, it will be resumed",
+                    self.name,
+                    failed_date,
+                )
+                responses.close()
+                return
+            _logger.info(
+                "Backfill %s stored rates up to %s", self.name, checkpoint_date
+            )
+
+        self.state = "done"
+
+    @api.model
+    def _cron_process_backfills(self):
+        backfills = self.with_context(l10n_do_service_priority="bulk").search(
+            [("state", "in", ("queued", "running"))]
+        )
+        for backfill in backfills:
+            backfill._run()
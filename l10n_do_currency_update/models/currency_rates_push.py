@@ -0,0 +1,93 @@
+#  Copyright (c) 2018 - Indexa SRL. (https://www.indexa.do) <info@indexa.do>
+#  See LICENSE file for full licensing details.
+
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+from .currency_backfill import _provider_selection
+
+_logger = logging.getLogger(__name__)
+
+
+class CurrencyRatesPush(models.Model):
+    _name = "l10n_do.currency.rates.push"
+    _description = "Pushed Currency Rates"
+    _order = "id desc"
+    _rec_name = "key"
+
+    key = fields.Char(
+        "Idempotency Key",
+        required=True,
+        readonly=True,
+        help="Sender key of the push, a push is only applied once per key.",
+    )
+    provider = fields.Selection(
+        _provider_selection, string="Bank", required=True, readonly=True
+    )
+    date = fields.Date(required=True, readonly=True)
+    company_ids = fields.Many2many(
+        "res.company", string="Updated Companies", readonly=True
+    )
+    rate_count = fields.Integer("Rates", readonly=True)
+
+    _sql_constraints = [
+        ("key_uniq", "unique(key)", "A rates push with this key already exists."),
+    ]
+
+    @api.model
+    def _ingest(self, key, provider, date, response):
+        """
+        Apply a pushed rates payload unless its key was already received.
+        The key is claimed in the current transaction, so a push failing
+        halfway can be retried with the same key.
+
+        :param response: decoders.RatesResponse
+        :return: tuple (l10n_do.currency.rates.push, already received)
+        """
+        now = fields.Datetime.now()
+        self.env.cr.execute(
+            """
+            INSERT INTO l10n_do_currency_rates_push (
+                key, provider, date, rate_count,
+                create_uid, create_date, write_uid, write_date
+            )
+            VALUES (%s, %s, %s, 0, %s, %s, %s, %s)
+            ON CONFLICT (key) DO NOTHING
+            RETURNING id
+            """,
+            (key, provider, date, self.env.uid, now, self.env.uid, now),
+        )
+        row = self.env.cr.fetchone()
+        if not row:
+            return self.search([("key", "=", key)]), True
+
+        push = self.browse(row[0])
+        companies = self.env["res.company"]._l10n_do_ingest_pushed_rates(
+            provider, date, response
+        )
+        push.write(
+            {
+                "company_ids": [(6, 0, companies.ids)],
+                "rate_count": len([entry for entry in response.rates if entry.rate]),
+            }
+        )
+        _logger.info(
+            "Pushed %s rates of %s stored for companies %s",
+            provider,
+            date,
+            companies.ids,
+        )
+        return push, False
+
+    @api.autovacuum
+    def _gc_rates_push(self):
+        days = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("indexa.webhook.retention_days", 90)
+        )
+        self.search(
+            [("create_date", "<", fields.Datetime.now() - timedelta(days=float(days)))]
+        ).unlink()
@@ -1,17 +1,29 @@
 #  Copyright (c) 2018 - Indexa SRL. (https://www.indexa.do) <info@indexa.do>
 #  See LICENSE file for full licensing details.
 
-import json
 import logging
 import requests
 import datetime
 import pytz
+import statistics
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
 from dateutil.relativedelta import relativedelta
 
 from odoo import models, fields, api, _
+from odoo.tools import float_compare
+
+from odoo.addons.l10n_do_external_service.tools import decoders
 
 _logger = logging.getLogger(__name__)
 
+CURRENCY_CRON_CHUNK_SIZE = 20
+
+CURRENCY_INTERVALS = {
+    "daily": relativedelta(days=+1),
+    "weekly": relativedelta(weeks=+1),
+    "monthly": relativedelta(months=+1),
+}
+
 CURRENCY_MAPPING = {
     "euro": "EUR",
     "cdol": "CAD",
@@ -21,6 +33,37 @@ CURRENCY_MAPPING = {
 }
 
 
+def _request_currency_rates(client, api_url, params, token):
+    """
+    Request currency rates from external service.
+
+    :return: response text, {} if the service couldn't be reached
+    """
+    try:
+        response = client.get(api_url, params, headers={"x-access-token": token})
+    except requests.exceptions.RequestException as e:
+        _logger.warning("API requests return the following error %s" % e)
+        return {}
+    return response.text
+
+
+EMPTY_RATES = decoders.RatesResponse(False, [])
+
+
+def _decode_currency_rates(content):
+    """
+    :return: decoders.RatesResponse, EMPTY_RATES if the request failed or
+    its response is malformed
+    """
+    if not content:
+        return EMPTY_RATES
+    try:
+        return decoders.decode_rates(content)
+    except decoders.DecodeError as e:
+        _logger.warning(e)
+    return EMPTY_RATES
+
+
 class ResCompany(models.Model):
     _inherit = "res.company"
 
@@ -55,111 +98,487 @@ class ResCompany(models.Model):
     )
     l10n_do_rate_offset = fields.Float("Offset", default=0)
     l10n_do_currency_next_execution_date = fields.Date(
-        string="Following Execution Date"
+        string="Following Execution Date", index=True
     )
     l10n_do_last_currency_sync_date = fields.Date(
         string="Last Sync Date", readonly=True
     )
+    l10n_do_currency_fetch_mode = fields.Selection(
+        [
+            ("single", "Selected Bank"),
+            ("fallback", "Selected Bank, BCD Fallback"),
+            ("fastest", "Fastest Bank"),
+            ("median", "Banks Median"),
+        ],
+        default="single",
+        string="Rates Source",
+        help="-Selected Bank: only query the selected bank.\n"
+        "-Selected Bank, BCD Fallback: use Banco Central rates when the selected "
+        "bank doesn't answer.\n"
+        "-Fastest Bank: query every bank and use the first valid response.\n"
+        "-Banks Median: query every bank and use the median of the rates "
+        "received before the deadline.",
+    )
+    l10n_do_last_currency_provider = fields.Char(
+        string="Last Sync Source", readonly=True
+    )
 
     def get_currency_rates(self, params, token):
         api_url = self.env["ir.config_parameter"].sudo().get_param("indexa.api.url")
+        client = self.env["l10n_do.external.service"]._get_http_client("rates")
+        return _request_currency_rates(client, api_url, params, token)
 
-        try:
-            response = requests.get(api_url, params, headers={"x-access-token": token})
-        except requests.exceptions.ConnectionError as e:
-            _logger.warning(_("API requests return the following error %s" % e))
+    @api.model
+    def _l10n_do_fetch_provider_rates(
+        self, providers, date, deadline=None, required=None
+    ):
+        """
+        Fetch the rates of several providers concurrently, one request each.
+
+        :param providers: list of l10n_do_currency_provider values
+        :param date: string date, Eg: 2021-10-22
+        :param deadline: seconds to wait for responses, late ones are dropped
+        :param required: providers whose response is awaited, all of them by
+        default. The others are only awaited until a valid response arrived.
+        :return: dict {provider: decoders.RatesResponse, EMPTY_RATES if it failed
+        or was late} in response arrival order. Providers no longer awaited are
+        left out.
+        """
+        providers = list(set(providers))
+        if not providers:
             return {}
-        return response.text
+        required = set(providers if required is None else required)
 
-    def l10n_do_update_currency_rates(self):
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        api_url = get_param("indexa.api.url")
+        token = get_param("indexa.api.token")
+        client = self.env["l10n_do.external.service"]._get_http_client("rates")
 
-        all_good = True
-        res = True
-        for company in self:
-            if company.l10n_do_currency_provider:
-                _logger.info("Calling API rates resource.")
-
-                tz = pytz.timezone("America/Santo_Domingo")
-                today = datetime.datetime.now(tz)
-                params = {
-                    "bank": company.l10n_do_currency_provider,
-                    "date": datetime.datetime.strftime(today, "%Y-%m-%d"),
-                }
+        _logger.info("Calling API rates resource for %s.", ", ".join(providers))
+        executor = ThreadPoolExecutor(len(providers))
+        futures = {
+            executor.submit(
+                _request_currency_rates,
+                client,
+                api_url,
+                {"bank": provider, "date": date},
+                token,
+            ): provider
+            for provider in providers
+        }
+        result = {}
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                result[futures[future]] = _decode_currency_rates(future.result())
+                if required.issubset(result) and any(
+                    response.rates for response in result.values()
+                ):
+                    break
+        except TimeoutError:
+            _logger.warning(
+                "Rates of %s didn't arrive before the deadline",
+                ", ".join(set(providers) - set(result)),
+            )
+            for provider in providers:
+                result.setdefault(provider, EMPTY_RATES)
+        finally:
+            # Don't wait for late responses, they are bounded by the client timeout
+            executor.shutdown(wait=False)
+        return result
+
+    def _l10n_do_get_fetch_providers(self):
+        """
+        :return: list of providers to query for this company rates source
+        """
+        self.ensure_one()
+        if self.l10n_do_currency_fetch_mode in ("fastest", "median"):
+            selection = self._fields["l10n_do_currency_provider"].selection
+            return [provider for provider, label in selection]
+        if not self.l10n_do_currency_provider:
+            return []
+        if self.l10n_do_currency_fetch_mode == "fallback":
+            return [self.l10n_do_currency_provider, "bcd"]
+        return [self.l10n_do_currency_provider]
+
+    @api.model
+    def _l10n_do_get_provider_label(self, provider):
+        return dict(self._fields["l10n_do_currency_provider"].selection).get(
+            provider, provider
+        )
+
+    def _l10n_do_select_provider_rates(self, provider_rates):
+        """
+        Pick this company rates among the fetched providers responses
+        according to its rates source.
+
+        :param provider_rates: dict as returned by _l10n_do_fetch_provider_rates
+        :return: tuple (decoders.RatesResponse, source description). The
+        description is the provider label, or the median providers labels.
+        """
+        self.ensure_one()
+        mode = self.l10n_do_currency_fetch_mode
+        valid = {
+            provider: response
+            for provider, response in provider_rates.items()
+            if response.rates
+        }
+        if mode == "fastest":
+            for provider in provider_rates:
+                if provider in valid:
+                    return valid[provider], self._l10n_do_get_provider_label(provider)
+            return EMPTY_RATES, False
+
+        if mode == "median":
+            values = {}
+            for response in valid.values():
+                for entry in response.rates:
+                    if entry.rate:
+                        values.setdefault(entry.name, []).append(entry.rate)
+            if not values:
+                return EMPTY_RATES, False
+            response = decoders.RatesResponse(
+                "success",
+                [
+                    decoders.RateEntry(name, statistics.median(rates))
+                    for name, rates in values.items()
+                ],
+            )
+            return response, _("Median of %s") % ", ".join(
+                map(self._l10n_do_get_provider_label, valid)
+            )
+
+        provider = self.l10n_do_currency_provider
+        if mode == "fallback" and provider not in valid and "bcd" in valid:
+            provider = "bcd"
+        return (
+            provider_rates.get(provider, EMPTY_RATES),
+            self._l10n_do_get_provider_label(provider),
+        )
+
+    @api.model
+    def _l10n_do_get_mapped_currencies(self):
+        """
+        :return: dict {API currency prefix: res.currency} of active currencies
+        """
+        currencies = {}
+        for prefix, code in CURRENCY_MAPPING.items():
+            currency_id = self.env.ref("base." + code, raise_if_not_found=False)
+            if currency_id and currency_id.active:
+                currencies[prefix] = currency_id
+        return currencies
+
+    def _l10n_do_parse_currency_rates(self, response, currencies):
+        """
+        Get the rates of this company base from an API response.
+
+        :param response: decoders.RatesResponse
+        :param currencies: dict as returned by _l10n_do_get_mapped_currencies
+        :return: dict {res.currency: inverse rate including company offset}
+        """
+        self.ensure_one()
+        rates = {}
+        for entry in response.rates:
+            if entry.name.endswith(self.l10n_do_currency_base or "x") and entry.rate:
+                currency_id = currencies.get(entry.name[:4])
+                if currency_id:
+                    rates[currency_id] = 1 / (entry.rate + self.l10n_do_rate_offset)
+        return rates
 
-                token = (
-                    self.env["ir.config_parameter"].sudo().get_param("indexa.api.token")
+    @api.model
+    def _l10n_do_upsert_currency_rates(self, rate_values):
+        """
+        Create or update res.currency.rate records in bulk. Existing rates
+        are read in a single query, new ones created in a single batch and
+        changed ones written grouped by value. Unchanged rates are skipped.
+
+        :param rate_values: dict {(date, currency_id, company_id): rate}
+        """
+        if not rate_values:
+            return
+
+        Rate = self.env["res.currency.rate"]
+        dates, currency_ids, company_ids = (set(key) for key in zip(*rate_values))
+        existing = {
+            (rate.name, rate.currency_id.id, rate.company_id.id): rate
+            for rate in Rate.search(
+                [
+                    ("name", "in", list(dates)),
+                    ("currency_id", "in", list(currency_ids)),
+                    ("company_id", "in", list(company_ids)),
+                ]
+            )
+        }
+
+        to_create, to_write = [], {}
+        for key, value in rate_values.items():
+            rate = existing.get(key)
+            if not rate:
+                date, currency_id, company_id = key
+                to_create.append(
+                    {
+                        "name": date,
+                        "currency_id": currency_id,
+                        "rate": value,
+                        "company_id": company_id,
+                    }
                 )
-                rates_dict = self.get_currency_rates(params, token)
-
-                d = {}
-                try:
-                    d = json.loads(rates_dict)
-                except TypeError:
-                    _logger.warning(_("No serializable data from API response"))
-
-                Rate = self.env["res.currency.rate"]
-
-                if "data" in d:
-                    for currency in d["data"]:
-                        if (
-                            str(currency["name"]).endswith(
-                                company.l10n_do_currency_base or "x"
-                            )
-                            and currency["rate"]
-                        ):
-                            inverse_rate = 1 / (
-                                float(currency["rate"]) + company.l10n_do_rate_offset
-                            )
-
-                            currency_id = self.env.ref(
-                                "base." + CURRENCY_MAPPING[str(currency["name"])[:4]]
-                            )
-                            if currency_id and currency_id.active:
-                                rate_id = Rate.search(
-                                    [
-                                        ("name", "=", fields.Date.today()),
-                                        ("currency_id", "=", currency_id.id),
-                                        ("company_id", "=", company.id),
-                                    ]
-                                )
-                                if rate_id:
-                                    rate_id.write({"rate": inverse_rate})
-                                else:
-                                    Rate.create(
-                                        {
-                                            "currency_id": currency_id.id,
-                                            "rate": inverse_rate,
-                                            "company_id": company.id,
-                                        }
-                                    )
-                    company.l10n_do_last_currency_sync_date = fields.Date.today()
-                else:
-                    res = False
+            elif float_compare(rate.rate, value, precision_digits=12):
+                to_write.setdefault(value, Rate)
+                to_write[value] |= rate
+
+        if to_create:
+            Rate.create(to_create)
+        for value, rates in to_write.items():
+            rates.write({"rate": value})
+
+    def _l10n_do_fetch_missing_provider_rates(self, provider_rates):
+        """
+        Fetch the providers the companies in self need and provider_rates
+        lacks, adding their responses to it.
+
+        :param provider_rates: dict as returned by _l10n_do_fetch_provider_rates
+        """
+        # Fastest bank companies only need one valid response, from any bank
+        fastest = self.filtered(lambda c: c.l10n_do_currency_fetch_mode == "fastest")
+        required = {
+            provider
+            for company in self - fastest
+            for provider in company._l10n_do_get_fetch_providers()
+        }
+        providers = set(required)
+        if fastest and not any(r.rates for r in provider_rates.values()):
+            providers.update(fastest[0]._l10n_do_get_fetch_providers())
+        providers -= set(provider_rates)
+        required -= set(provider_rates)
+        if not providers:
+            return
+
+        tz = pytz.timezone("America/Santo_Domingo")
+        today = datetime.datetime.now(tz)
+        deadline = None
+        modes = self.mapped("l10n_do_currency_fetch_mode")
+        if any(mode != "single" for mode in modes):
+            deadline = float(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("indexa.api.deadline", 10)
+            )
+        provider_rates.update(
+            self._l10n_do_fetch_provider_rates(
+                list(providers),
+                datetime.datetime.strftime(today, "%Y-%m-%d"),
+                deadline=deadline,
+                required=required,
+            )
+        )
+
+    def l10n_do_update_currency_rates(self, provider_rates=None):
+        """
+        :param provider_rates: dict as returned by _l10n_do_fetch_provider_rates
+        of the responses already fetched today. The providers it lacks are
+        fetched and added to it, so successive calls sharing it fetch each
+        provider once.
+        """
+
+        all_good = True
+
+        if provider_rates is None:
+            provider_rates = {}
+        self._l10n_do_fetch_missing_provider_rates(provider_rates)
+
+        rate_date = fields.Date.today()
+        currencies = self._l10n_do_get_mapped_currencies()
+        rate_values = {}
+        synced_companies = {}
+        for company in self:
+            response, source = company._l10n_do_select_provider_rates(provider_rates)
+            if response.rates:
+                rates = company._l10n_do_parse_currency_rates(response, currencies)
+                for currency_id, rate in rates.items():
+                    rate_values[(rate_date, currency_id.id, company.id)] = rate
+                synced_companies.setdefault(source, self.browse())
+                synced_companies[source] |= company
             else:
-                res = False
-            if not res:
                 all_good = False
                 _logger.warning(_("Unable to fetch new rates records from API"))
+
+        self._l10n_do_upsert_currency_rates(rate_values)
+        for source, companies in synced_companies.items():
+            companies.write(
+                {
+                    "l10n_do_last_currency_sync_date": rate_date,
+                    "l10n_do_last_currency_provider": source,
+                }
+            )
         return all_good
 
     @api.model
-    def l10n_do_run_update_currency(self):
+    def _l10n_do_ingest_pushed_rates(self, provider, date, response):
+        """
+        Store rates pushed by a bank for the companies updated from it,
+        except the ones using the banks median. When the rates are today's,
+        their polling update isn't due until their next interval.
+
+        :param provider: l10n_do_currency_provider value
+        :param date: datetime.date of the rates
+        :param response: decoders.RatesResponse
+        :return: res.company recordset whose rates were stored
+        """
+        companies = self.sudo().search(
+            [
+                ("l10n_do_currency_provider", "=", provider),
+                ("l10n_do_currency_fetch_mode", "!=", "median"),
+                ("l10n_do_currency_interval_unit", "in", tuple(CURRENCY_INTERVALS)),
+            ]
+        )
+        currencies = self._l10n_do_get_mapped_currencies()
+        rate_values = {}
+        synced_companies = self.browse()
+        for company in companies:
+            rates = company._l10n_do_parse_currency_rates(response, currencies)
+            for currency_id, rate in rates.items():
+                rate_values[(date, currency_id.id, company.id)] = rate
+            if rates:
+                synced_companies |= company
+
+        self._l10n_do_upsert_currency_rates(rate_values)
+        today = fields.Date.today()
+        if date == today:
+            for unit, interval in CURRENCY_INTERVALS.items():
+                synced_companies.filtered(
+                    lambda c: c.l10n_do_currency_interval_unit == unit
+                ).write(
+                    {
+                        "l10n_do_last_currency_sync_date": today,
+                        "l10n_do_last_currency_provider": (
+                            self._l10n_do_get_provider_label(provider)
+                        ),
+                        "l10n_do_currency_next_execution_date": today + interval,
+                    }
+                )
+        return synced_companies
+
+    def l10n_do_replay_currency_rates(self, date_from=None, date_to=None):
+        """
+        Re-derive the rates of the companies in self from the responses
+        journaled between two datetimes, without any network call. Each
+        company takes the rates of its own bank, for the date requested.
+
+        :return: number of rates created or updated
+        """
+        Journal = self.env["l10n_do.external.service.journal"].sudo()
+        currencies = self._l10n_do_get_mapped_currencies()
+        rate_values = {}
+        responses = Journal._iter_responses("rates", date_from, date_to)
+        for params, content, __ in responses:
+            companies = self.filtered(
+                lambda c: c.l10n_do_currency_provider == params.get("bank")
+            )
+            if not companies or not params.get("date"):
+                continue
+            response = _decode_currency_rates(content)
+            rate_date = fields.Date.to_date(params["date"])
+            for company in companies:
+                rates = company._l10n_do_parse_currency_rates(response, currencies)
+                for currency_id, rate in rates.items():
+                    rate_values[(rate_date, currency_id.id, company.id)] = rate
+        self._l10n_do_upsert_currency_rates(rate_values)
+        return len(rate_values)
+
+    def l10n_do_backfill_currency_rates(self, date_from, date_to, provider=False):
+        """
+        Queue the import of historical rates between two dates for the
+        companies in self. Without provider, each company bank is used.
+
+        :return: l10n_do.currency.backfill records
+        """
+        Backfill = self.env["l10n_do.currency.backfill"]
+        companies_by_provider = {}
+        for company in self:
+            company_provider = provider or company.l10n_do_currency_provider
+            if company_provider:
+                companies_by_provider.setdefault(company_provider, self.browse())
+                companies_by_provider[company_provider] |= company
+
+        backfills = Backfill.create(
+            [
+                {
+                    "provider": company_provider,
+                    "company_ids": [(6, 0, companies.ids)],
+                    "date_from": date_from,
+                    "date_to": date_to,
+                }
+                for company_provider, companies in companies_by_provider.items()
+            ]
+        )
+        backfills.action_start()
+        return backfills
+
+    @api.model
+    def _l10n_do_lock_due_companies(self, limit, exclude_ids=()):
+        """
+        Lock the next companies whose rates update is due. Companies locked
+        by another cron worker are skipped, so several workers can share
+        the run. The lock doesn't block inserts referencing the companies.
+
+        :return: res.company recordset
+        """
+        self.env.cr.execute(
+            """
+            SELECT id FROM res_company
+            WHERE l10n_do_currency_interval_unit IN %s
+            AND (l10n_do_currency_next_execution_date IS NULL
+                 OR l10n_do_currency_next_execution_date <= %s)
+            AND id NOT IN %s
+            ORDER BY id
+            LIMIT %s
+            FOR NO KEY UPDATE SKIP LOCKED
+            """,
+            (
+                tuple(CURRENCY_INTERVALS),
+                datetime.date.today(),
+                tuple(exclude_ids) or (0,),
+                limit,
+            ),
+        )
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
 
-        records = self.search([])
-        if records:
-            to_update = self.env["res.company"]
-            for record in records:
-                if record.l10n_do_currency_interval_unit == "daily":
-                    next_update = relativedelta(days=+1)
-                elif record.l10n_do_currency_interval_unit == "weekly":
-                    next_update = relativedelta(weeks=+1)
-                elif record.l10n_do_currency_interval_unit == "monthly":
-                    next_update = relativedelta(months=+1)
-                else:
-                    record.l10n_do_currency_interval_unit = False
-                    continue
-                record.l10n_do_currency_next_execution_date = (
-                    datetime.date.today() + next_update
+    @api.model
+    def l10n_do_run_update_currency(self):
+        """
+        Update the rates of the companies that are due, in chunks of
+        CURRENCY_CRON_CHUNK_SIZE companies committed one by one. A failing
+        chunk is rolled back and skipped without affecting the others.
+        Each provider is fetched once for the whole run, before any
+        company is locked.
+        """
+        provider_rates = {}
+        self.sudo().search(
+            [
+                ("l10n_do_currency_interval_unit", "in", tuple(CURRENCY_INTERVALS)),
+                "|",
+                ("l10n_do_currency_next_execution_date", "=", False),
+                ("l10n_do_currency_next_execution_date", "<=", datetime.date.today()),
+            ]
+        )._l10n_do_fetch_missing_provider_rates(provider_rates)
+        failed_ids = []
+        while True:
+            companies = self._l10n_do_lock_due_companies(
+                CURRENCY_CRON_CHUNK_SIZE, failed_ids
+            )
+            if not companies:
+                break
+            try:
+                with self.env.cr.savepoint():
+                    for company in companies:
+                        company.l10n_do_currency_next_execution_date = (
+                            datetime.date.today()
+                            + CURRENCY_INTERVALS[company.l10n_do_currency_interval_unit]
+                        )
+                    companies.l10n_do_update_currency_rates(provider_rates)
+            except Exception:
+                failed_ids.extend(companies.ids)
+                _logger.exception(
+                    "Currency rates update failed for companies %s", companies.ids
                 )
-                to_update += record
-            to_update.l10n_do_update_currency_rates()
+            self.env.cr.commit()  # pylint: disable=invalid-commit
@@ -29,6 +29,12 @@ class ResConfigSettings(models.TransientModel):
     l10n_do_last_currency_sync_date = fields.Date(
         related="company_id.l10n_do_last_currency_sync_date", readonly=False
     )
+    l10n_do_currency_fetch_mode = fields.Selection(
+        related="company_id.l10n_do_currency_fetch_mode", readonly=False
+    )
+    l10n_do_last_currency_provider = fields.Char(
+        related="company_id.l10n_do_last_currency_provider"
+    )
 
     @api.onchange("l10n_do_currency_interval_unit")
     def onchange_l10n_do_currency_interval_unit(self):
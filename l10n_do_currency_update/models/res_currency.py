@@ -0,0 +1,53 @@
+#  Copyright (c) 2018 - Indexa SRL. (https://www.indexa.do) <info@indexa.do>
+#  See LICENSE file for full licensing details.
+
+from odoo import models, fields, api, tools
+
+
+class ResCurrency(models.Model):
+    _inherit = "res.currency"
+
+    @api.model
+    @tools.ormcache("company_id", "date")
+    def _l10n_do_get_all_rates(self, company_id, date):
+        """
+        Rates of every currency for a company at a date, kept in this
+        worker cache until res.currency.rate records change.
+
+        :return: dict {currency id: rate}
+        """
+        currencies = self.with_context(active_test=False).search([])
+        company = self.env["res.company"].browse(company_id)
+        return super(ResCurrency, currencies)._get_rates(company, date)
+
+    def _get_rates(self, company, date):
+        if not self.ids or not company:
+            return super(ResCurrency, self)._get_rates(company, date)
+        rates = self._l10n_do_get_all_rates(company.id, fields.Date.to_date(date))
+        if any(currency_id not in rates for currency_id in self.ids):
+            # Currency created after the rates were cached
+            return super(ResCurrency, self)._get_rates(company, date)
+        return {currency_id: rates[currency_id] for currency_id in self.ids}
+
+
+class ResCurrencyRate(models.Model):
+    _inherit = "res.currency.rate"
+
+    # Any rate change invalidates the cached rates of every worker through
+    # the registry cache signaling
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(ResCurrencyRate, self).create(vals_list)
+        self.env["res.currency"].clear_caches()
+        return records
+
+    def write(self, vals):
+        result = super(ResCurrencyRate, self).write(vals)
+        self.env["res.currency"].clear_caches()
+        return result
+
+    def unlink(self):
+        result = super(ResCurrencyRate, self).unlink()
+        self.env["res.currency"].clear_caches()
+        return result
@@ -1 +1,6 @@
+from . import test_backfill
+from . import test_benchmark
+from . import test_currency_rates_cache
 from . import test_get_currency_rates
+from . import test_rates_sources
+from . import test_rates_webhook
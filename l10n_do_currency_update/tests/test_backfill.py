@@ -0,0 +1,87 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.l10n_do_external_service.tests.common import (
+    MockServiceCase,
+    mock_rates,
+)
+
+
+@tagged("post_install", "-at_install")
+class CurrencyBackfillTest(MockServiceCase, TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super(CurrencyBackfillTest, cls).setUpClass()
+        cls.company = cls.env.company
+        cls.company.write(
+            {
+                "l10n_do_currency_provider": "bpd",
+                "l10n_do_currency_base": "sellrate",
+                "l10n_do_rate_offset": 0,
+            }
+        )
+        cls.euro = cls.env.ref("base.EUR")
+        cls.euro.active = True
+        date_to = fields.Date.today() - timedelta(days=1)
+        cls.dates = [date_to - timedelta(days=days) for days in range(9, -1, -1)]
+
+    def setUp(self):
+        super(CurrencyBackfillTest, self).setUp()
+        self._euro_rates().unlink()
+
+    def _euro_rates(self):
+        return self.env["res.currency.rate"].search(
+            [
+                ("currency_id", "=", self.euro.id),
+                ("company_id", "=", self.company.id),
+                ("name", ">=", self.dates[0]),
+                ("name", "<=", self.dates[-1]),
+            ],
+            order="name",
+        )
+
+    def _euro_rate_dates(self):
+        return self._euro_rates().mapped("name")
+
+    def _run_cron(self):
+        with patch.object(type(self.env.cr), "commit"):
+            self.env["l10n_do.currency.backfill"]._cron_process_backfills()
+
+    def test_001_resume_from_checkpoint(self):
+        """An interrupted backfill resumes after its checkpoint date"""
+        failed_date = fields.Date.to_string(self.dates[5])
+
+        def failing_rates(params):
+            if params.get("date") == failed_date:
+                return 503, {"status": "error", "message": "Unavailable"}
+            return mock_rates(params)
+
+        self.mock_server.routes["rates"] = failing_rates
+        self.addCleanup(self.mock_server.routes.__setitem__, "rates", mock_rates)
+
+        backfill = self.env["l10n_do.currency.backfill"].create(
+            {
+                "provider": "bpd",
+                "company_ids": [(6, 0, self.company.ids)],
+                "date_from": self.dates[0],
+                "date_to": self.dates[-1],
+                "chunk_size": 3,
+            }
+        )
+        backfill.action_start()
+        self._run_cron()
+        self.assertEqual(backfill.state, "running")
+        self.assertEqual(backfill.checkpoint_date, self.dates[4])
+        self.assertEqual(self._euro_rate_dates(), self.dates[:5])
+
+        self.mock_server.routes["rates"] = mock_rates
+        self.mock_server.reset()
+        self._run_cron()
+        self.assertEqual(backfill.state, "done")
+        self.assertEqual(backfill.checkpoint_date, self.dates[-1])
+        self.assertEqual(self._euro_rate_dates(), self.dates)
+        # Only the days after the checkpoint are requested again
+        self.assertEqual(self.mock_server.calls["rates"], 5)
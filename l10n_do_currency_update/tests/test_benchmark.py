@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+from odoo.addons.l10n_do_external_service.tests.common import MockServiceCase
+
+
+@tagged("post_install", "-at_install", "-standard", "benchmark")
+class CurrencyCronBenchmark(MockServiceCase, AccountTestInvoicingCommon):
+    mock_latency = 0.05
+
+    def test_001_multi_company_currency_cron(self):
+        Company = self.env["res.company"]
+        modes = ("single", "fallback", "fastest", "median")
+        companies = Company.create(
+            [
+                {
+                    "name": "Benchmark Company %s" % i,
+                    "l10n_do_currency_interval_unit": "daily",
+                    "l10n_do_currency_fetch_mode": modes[i % len(modes)],
+                }
+                for i in range(20)
+            ]
+        )
+        # The cron commits each chunk, keep the test transaction open
+        with patch.object(type(self.env.cr), "commit"), self.benchmark(
+            "multi-company currency cron", len(companies)
+        ) as stats:
+            Company.l10n_do_run_update_currency()
+
+        # One request per bank, whatever the number of companies
+        providers = Company._fields["l10n_do_currency_provider"].selection
+        self.assertLessEqual(stats["http_calls"].get("rates"), len(providers))
+        self.assertEqual(
+            set(companies.mapped("l10n_do_last_currency_sync_date")),
+            {fields.Date.today()},
+        )
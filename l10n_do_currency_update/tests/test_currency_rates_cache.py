@@ -0,0 +1,40 @@
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class CurrencyRatesCacheTest(TransactionCase):
+    def setUp(self):
+        super(CurrencyRatesCacheTest, self).setUp()
+        self.company = self.env.company
+        self.euro = self.env.ref("base.EUR")
+        self.euro.active = True
+        self.env["res.currency.rate"].search(
+            [("currency_id", "=", self.euro.id)]
+        ).unlink()
+        self.today = fields.Date.today()
+
+    def _euro_rate(self):
+        return self.euro._get_rates(self.company, self.today)[self.euro.id]
+
+    def test_001_cached_rates(self):
+        self.assertEqual(self._euro_rate(), 1.0)
+        with self.assertQueryCount(0):
+            self.assertEqual(self._euro_rate(), 1.0)
+
+    def test_002_invalidation(self):
+        """Rates changes are seen right away despite the cache"""
+        self.assertEqual(self._euro_rate(), 1.0)
+        rate = self.env["res.currency.rate"].create(
+            {
+                "currency_id": self.euro.id,
+                "company_id": self.company.id,
+                "name": self.today,
+                "rate": 0.02,
+            }
+        )
+        self.assertEqual(self._euro_rate(), 0.02)
+        rate.rate = 0.03
+        self.assertEqual(self._euro_rate(), 0.03)
+        rate.unlink()
+        self.assertEqual(self._euro_rate(), 1.0)
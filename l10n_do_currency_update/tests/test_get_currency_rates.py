@@ -2,14 +2,19 @@ from odoo import fields
 from odoo.addons.account.tests.common import AccountTestInvoicingCommon
 from odoo.tests import tagged
 
+from odoo.addons.l10n_do_external_service.tests.common import (
+    MOCK_TOKEN,
+    MockServiceCase,
+)
+
 
 @tagged("post_install", "-at_install")
-class GetCurrencyRatesTest(AccountTestInvoicingCommon):
+class GetCurrencyRatesTest(MockServiceCase, AccountTestInvoicingCommon):
     def test_001_get_currency_rates(self):
 
         data = self.env["res.company"].get_currency_rates(
             {"bank": "bpd", "date": fields.Date.today()},
-            "a79c2dfc-858d-4813-bb77-7695c1c320db",
+            MOCK_TOKEN,
         )
         import ast
 
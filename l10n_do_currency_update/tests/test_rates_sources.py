@@ -0,0 +1,83 @@
+import statistics
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.l10n_do_external_service.tests.common import (
+    MockServiceCase,
+    mock_rates,
+)
+
+
+@tagged("post_install", "-at_install")
+class RatesSourcesTest(MockServiceCase, TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super(RatesSourcesTest, cls).setUpClass()
+        cls.company = cls.env.company
+        cls.company.write(
+            {
+                "l10n_do_currency_provider": "bpd",
+                "l10n_do_currency_base": "sellrate",
+                "l10n_do_rate_offset": 0,
+            }
+        )
+        cls.euro = cls.env.ref("base.EUR")
+        cls.euro.active = True
+        selection = cls.company._fields["l10n_do_currency_provider"].selection
+        cls.providers = [provider for provider, label in selection]
+
+    def _mock_rate(self, provider):
+        data = mock_rates({"bank": provider})[1]["data"]
+        return next(float(d["rate"]) for d in data if d["name"] == "eurosellrate")
+
+    def _euro_rate(self):
+        return self.env["res.currency.rate"].search(
+            [
+                ("currency_id", "=", self.euro.id),
+                ("company_id", "=", self.company.id),
+                ("name", "=", fields.Date.today()),
+            ]
+        )
+
+    def _fail_bank(self, bank):
+        """Answer the rates requests of a bank with a server error."""
+        routes = self.mock_server.routes
+        rates_route = routes["rates"]
+
+        def failing_rates(params):
+            if params.get("bank") == bank:
+                return 503, {"status": "error", "message": "Unavailable"}
+            return rates_route(params)
+
+        routes["rates"] = failing_rates
+        self.addCleanup(routes.__setitem__, "rates", rates_route)
+
+    def test_001_median(self):
+        self.company.l10n_do_currency_fetch_mode = "median"
+        self.assertTrue(self.company.l10n_do_update_currency_rates())
+
+        median = statistics.median(map(self._mock_rate, self.providers))
+        self.assertAlmostEqual(self._euro_rate().rate, 1 / median)
+        self.assertTrue(
+            self.company.l10n_do_last_currency_provider.startswith("Median of")
+        )
+
+    def test_002_bcd_fallback(self):
+        self.company.l10n_do_currency_fetch_mode = "fallback"
+        self._fail_bank("bpd")
+        self.assertTrue(self.company.l10n_do_update_currency_rates())
+
+        self.assertAlmostEqual(self._euro_rate().rate, 1 / self._mock_rate("bcd"))
+        self.assertEqual(
+            self.company.l10n_do_last_currency_provider, "Banco Central Dominicano"
+        )
+
+    def test_003_selected_bank(self):
+        self.company.l10n_do_currency_fetch_mode = "fallback"
+        self.assertTrue(self.company.l10n_do_update_currency_rates())
+
+        self.assertAlmostEqual(self._euro_rate().rate, 1 / self._mock_rate("bpd"))
+        self.assertEqual(
+            self.company.l10n_do_last_currency_provider, "Banco Popular Dominicano"
+        )
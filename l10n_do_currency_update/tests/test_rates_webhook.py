@@ -0,0 +1,120 @@
+import json
+import time
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import HttpCase, tagged
+
+from ..controllers.main import (
+    IDEMPOTENCY_HEADER,
+    SIGNATURE_HEADER,
+    TIMESTAMP_HEADER,
+    _sign,
+)
+
+WEBHOOK_SECRET = "webhook-secret"
+
+
+@tagged("post_install", "-at_install")
+class RatesWebhookTest(HttpCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env["ir.config_parameter"].sudo().set_param(
+            "indexa.webhook.secret", WEBHOOK_SECRET
+        )
+        cls.company = cls.env.company
+        cls.company.write(
+            {
+                "l10n_do_currency_provider": "bpd",
+                "l10n_do_currency_fetch_mode": "single",
+                "l10n_do_currency_interval_unit": "daily",
+                "l10n_do_currency_base": "sellrate",
+                "l10n_do_rate_offset": 0,
+            }
+        )
+        cls.euro = cls.env.ref("base.EUR")
+        cls.euro.active = True
+
+    def _push(self, payload, key="push-1", secret=WEBHOOK_SECRET, **headers):
+        body = json.dumps(payload).encode()
+        timestamp = str(int(time.time()))
+        headers = dict(
+            {
+                "Content-Type": "application/json",
+                SIGNATURE_HEADER: _sign(secret, timestamp, key, body),
+                TIMESTAMP_HEADER: timestamp,
+                IDEMPOTENCY_HEADER: key,
+            },
+            **headers
+        )
+        return self.url_open(
+            "/l10n_do_currency_update/rates", data=body, headers=headers
+        )
+
+    def _payload(self, rate="64.00"):
+        return {
+            "bank": "bpd",
+            "date": str(fields.Date.today()),
+            "status": "success",
+            "data": [{"name": "eurosellrate", "rate": rate}],
+        }
+
+    def _euro_rate(self):
+        return self.env["res.currency.rate"].search(
+            [
+                ("currency_id", "=", self.euro.id),
+                ("company_id", "=", self.company.id),
+                ("name", "=", fields.Date.today()),
+            ]
+        )
+
+    def test_001_push_rates(self):
+        response = self._push(self._payload())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "success")
+        self.assertAlmostEqual(self._euro_rate().rate, 1 / 64.0)
+        # Polling isn't due before the next interval
+        self.company.invalidate_cache()
+        self.assertEqual(
+            self.company.l10n_do_currency_next_execution_date,
+            fields.Date.today() + relativedelta(days=1),
+        )
+
+        # Same key, the push is only applied once
+        response = self._push(self._payload("65.00"))
+        self.assertEqual(response.json()["status"], "duplicated")
+        self.assertAlmostEqual(self._euro_rate().rate, 1 / 64.0)
+
+    def test_002_push_rejected(self):
+        response = self._push(self._payload(), secret="wrong-secret")
+        self.assertEqual(response.status_code, 401)
+        response = self._push(dict(self._payload(), bank="xyz"), key="push-2")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self._euro_rate())
+
+    def test_003_push_replayed(self):
+        """The timestamp and idempotency key are covered by the signature"""
+        payload = self._payload()
+        body = json.dumps(payload).encode()
+        stale = str(int(time.time()) - 3600)
+        response = self._push(
+            payload,
+            **{
+                TIMESTAMP_HEADER: stale,
+                SIGNATURE_HEADER: _sign(WEBHOOK_SECRET, stale, "push-1", body),
+            }
+        )
+        self.assertEqual(response.status_code, 401)
+        # Replaying a signed push under another key
+        response = self._push(payload, **{IDEMPOTENCY_HEADER: "push-2"})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(self._euro_rate())
+
+    def test_004_push_invalid_date(self):
+        next_year = fields.Date.today() + relativedelta(years=1)
+        for date in ("2021-02-30", "1999-01-01", str(next_year)):
+            response = self._push(dict(self._payload(), date=date), key=date)
+            self.assertEqual(response.status_code, 400, date)
+        self.assertFalse(self._euro_rate())
@@ -0,0 +1,17 @@
+{
+    "name": "Dominican External Services Base",
+    "version": "15.0.1.3.0",
+    "summary": "Shared HTTP client for Indexa external services",
+    "category": "Extra Tools",
+    "license": "LGPL-3",
+    "author": "Indexa",
+    "website": "https://www.indexa.do",
+    "depends": ["base"],
+    "data": [
+        "security/ir.model.access.csv",
+        "data/ir_config_parameter_data.xml",
+        "views/external_service_metric_views.xml",
+        "views/external_service_journal_views.xml",
+    ],
+    "installable": True,
+}
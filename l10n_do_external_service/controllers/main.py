@@ -0,0 +1,39 @@
+from odoo import http
+from odoo.http import request
+from odoo.tools import consteq
+
+
+class ExternalServiceMetrics(http.Controller):
+    @http.route(
+        "/l10n_do_external_service/metrics",
+        type="http",
+        auth="none",
+        methods=["GET"],
+        csrf=False,
+    )
+    def metrics(self, token=None, **kwargs):
+        """
+        Prometheus scrape endpoint. Disabled until indexa.metrics.token is
+        set, the token is taken from the token query parameter or a Bearer
+        Authorization header.
+        """
+        if not request.db:
+            return request.not_found()
+        expected = (
+            request.env["ir.config_parameter"]
+            .sudo()
+            .get_param("indexa.metrics.token")
+        )
+        authorization = request.httprequest.headers.get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            token = authorization[len("Bearer ") :]
+        if not expected or not token or not consteq(token, expected):
+            return request.not_found()
+
+        ExternalService = request.env["l10n_do.external.service"].sudo()
+        ExternalService._flush_metrics(force=True)
+        Metric = request.env["l10n_do.external.service.metric"].sudo()
+        body = Metric._render_prometheus()
+        return request.make_response(
+            body, headers=[("Content-Type", "text/plain; version=0.0.4")]
+        )
@@ -0,0 +1,4 @@
+from . import external_service
+from . import external_service_journal
+from . import external_service_metric
+from . import external_service_quota
@@ -0,0 +1,132 @@
+import logging
+from functools import partial
+
+import psycopg2
+
+from odoo import models, api
+from odoo.tools import str2bool
+
+from ..tools import http_client, journal, metrics, rate_limiter
+
+_logger = logging.getLogger(__name__)
+
+# Services sharing the Indexa API quota, and the key of their bucket
+RATE_LIMITED_SERVICES = ("rnc", "ncf", "rates")
+RATE_LIMIT_KEY = "indexa"
+
+# Cursor callbacks data key of the end of transaction flush
+FLUSH_CALLBACK_KEY = "l10n_do_external_service.flush"
+
+
+class ExternalService(models.AbstractModel):
+    _name = "l10n_do.external.service"
+    _description = "Dominican External Services Client"
+
+    @api.model
+    def _get_metrics_labels(self, service):
+        return (self.env.cr.dbname, service, self.env.company.id)
+
+    @api.model
+    def _get_rate_limiter(self, service):
+        """
+        :return: rate_limiter.RateLimiter configured from the
+        indexa.ratelimit.* system parameters, None if disabled. Every
+        service of the Indexa API takes its tokens from the same bucket.
+        """
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        rate = float(get_param("indexa.ratelimit.rate", 0))
+        if service not in RATE_LIMITED_SERVICES or rate <= 0:
+            return None
+        return rate_limiter.RateLimiter(
+            self.env.cr.dbname,
+            RATE_LIMIT_KEY,
+            rate,
+            float(get_param("indexa.ratelimit.burst", 20)),
+            reserve=float(get_param("indexa.ratelimit.interactive_reserve", 0.25)),
+            max_wait=float(get_param("indexa.ratelimit.max_wait", 60)),
+        )
+
+    @api.model
+    def _get_http_client(self, service):
+        """
+        Get the pooled HTTP client of an external service, configured
+        from the indexa.http.* system parameters. Its calls are recorded
+        under this database and the current company, and are rate limited
+        as interactive calls unless the l10n_do_service_priority context
+        key is bulk.
+
+        :param service: service name, Eg: rnc, ncf or rates
+        :return: http_client.BoundClient, safe to be used from threads
+        """
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        client = http_client.get_client(
+            service,
+            connect_timeout=float(get_param("indexa.http.connect_timeout", 5)),
+            read_timeout=float(get_param("indexa.http.read_timeout", 30)),
+            max_retries=int(get_param("indexa.http.max_retries", 2)),
+            backoff_factor=float(get_param("indexa.http.backoff_factor", 0.5)),
+            breaker_threshold=int(get_param("indexa.http.breaker_threshold", 5)),
+            breaker_reset=float(get_param("indexa.http.breaker_reset", 60)),
+            pool_size=int(get_param("indexa.http.pool_size", 10)),
+        )
+        self._flush_metrics()
+        self._flush_metrics_on_end()
+        return client.bind(
+            *self._get_metrics_labels(service),
+            limiter=self._get_rate_limiter(service),
+            priority=self.env.context.get("l10n_do_service_priority")
+            or rate_limiter.PRIORITY_INTERACTIVE,
+            journal=str2bool(get_param("indexa.journal.enabled", "1")),
+        )
+
+    @api.model
+    def _record_cache_lookups(self, service, hits=0, misses=0):
+        metrics.record_cache(self._get_metrics_labels(service), hits, misses)
+        self._flush_metrics_on_end()
+
+    @api.model
+    def _flush_metrics_on_end(self):
+        """
+        Store the buffered metrics and journal entries once the current
+        transaction is committed or rolled back, so the calls it made don't
+        stay in memory if this worker goes idle or is recycled afterwards.
+        """
+        cr = self.env.cr
+        if FLUSH_CALLBACK_KEY in cr.postcommit.data:
+            return
+        for callbacks in (cr.postcommit, cr.postrollback):
+            callbacks.data[FLUSH_CALLBACK_KEY] = True
+            callbacks.add(partial(self._flush_metrics, force=True))
+
+    @api.model
+    def _flush_metrics(self, force=False):
+        """
+        Store this worker buffered metrics and journal entries, at most
+        once every indexa.metrics.flush_interval seconds unless forced. A
+        separate cursor is used, so they survive the current transaction
+        rollback.
+        """
+        dbname = self.env.cr.dbname
+        if not force:
+            interval = float(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("indexa.metrics.flush_interval", 60)
+            )
+            if not metrics.flush_due(dbname, interval):
+                return
+        entries = metrics.pop(dbname)
+        journal_entries = journal.pop(dbname)
+        if not entries and not journal_entries:
+            return
+        try:
+            with self.pool.cursor() as cr:
+                env = self.env(cr=cr, su=True)
+                if entries:
+                    env["l10n_do.external.service.metric"]._add(entries)
+                if journal_entries:
+                    env["l10n_do.external.service.journal"]._add(journal_entries)
+        except psycopg2.Error as e:
+            _logger.warning("Unable to store external service metrics: %s", e)
+            metrics.restore(dbname, entries)
+            journal.restore(dbname, journal_entries)
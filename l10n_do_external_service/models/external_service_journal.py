@@ -0,0 +1,129 @@
+import json
+from datetime import timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api
+from odoo.tools import split_every
+from odoo.tools.sql import column_exists, create_column
+
+from ..tools import journal
+
+JOURNAL_REPLAY_BATCH_SIZE = 500
+
+
+class ExternalServiceJournal(models.Model):
+    _name = "l10n_do.external.service.journal"
+    _description = "External Service Responses Journal"
+    _order = "date desc, id desc"
+    _rec_name = "service"
+
+    date = fields.Datetime(required=True, index=True, readonly=True)
+    service = fields.Char(required=True, index=True, readonly=True)
+    company_id = fields.Many2one("res.company", readonly=True, ondelete="set null")
+    url = fields.Char("URL", readonly=True)
+    params = fields.Text(readonly=True, help="Request parameters, as JSON.")
+    status = fields.Char(readonly=True)
+    duration = fields.Float("Duration (s)", readonly=True)
+    payload_size = fields.Integer("Payload Size (bytes)", readonly=True)
+    payload_text = fields.Text(
+        "Payload", compute="_compute_payload_text", readonly=True
+    )
+
+    def init(self):
+        # zlib compressed response body, kept out of the ORM so it is never
+        # read unless explicitly asked for
+        if not column_exists(self.env.cr, self._table, "payload"):
+            create_column(self.env.cr, self._table, "payload", "bytea")
+
+    def _read_payloads(self):
+        """
+        :return: dict {journal id: decompressed response body}
+        """
+        if not self.ids:
+            return {}
+        self.env.cr.execute(
+            "SELECT id, payload FROM l10n_do_external_service_journal "
+            "WHERE id IN %s",
+            (tuple(self.ids),),
+        )
+        return {
+            journal_id: journal.decompress(payload)
+            for journal_id, payload in self.env.cr.fetchall()
+        }
+
+    def _compute_payload_text(self):
+        payloads = self._read_payloads()
+        for entry in self:
+            payload = payloads.get(entry.id, b"")
+            entry.payload_text = payload.decode("utf-8", errors="replace")
+
+    @api.model
+    def _add(self, entries):
+        """
+        Append buffered responses to the journal.
+
+        :param entries: list as returned by tools.journal.pop()
+        """
+        execute_values(
+            self.env.cr._obj,
+            """
+            INSERT INTO l10n_do_external_service_journal (
+                date, service, company_id, url, params, status, duration,
+                payload_size, payload, create_uid, create_date, write_uid,
+                write_date
+            )
+            VALUES %s
+            """,
+            [
+                entry + (self.env.uid, entry[0], self.env.uid, entry[0])
+                for entry in entries
+            ],
+        )
+
+    @api.model
+    def _iter_responses(self, service, date_from=None, date_to=None, status="200"):
+        """
+        Replay the journal without network calls: the latest response of
+        every distinct request of a service in a period.
+
+        :param date_from: datetime, journal entries date lower bound
+        :param date_to: datetime, journal entries date upper bound
+        :return: generator of (request params dict, response body bytes,
+        journal entry datetime)
+        """
+        query = """
+            SELECT DISTINCT ON (params) id
+            FROM l10n_do_external_service_journal
+            WHERE service = %s AND status = %s
+        """
+        args = [service, status]
+        if date_from:
+            query += " AND date >= %s"
+            args.append(date_from)
+        if date_to:
+            query += " AND date <= %s"
+            args.append(date_to)
+        self.env.cr.execute(query + " ORDER BY params, date DESC, id DESC", args)
+        journal_ids = [row[0] for row in self.env.cr.fetchall()]
+        # Payloads are read in batches, callers may use the cursor meanwhile
+        for batch in split_every(JOURNAL_REPLAY_BATCH_SIZE, journal_ids):
+            self.env.cr.execute(
+                "SELECT params, payload, date FROM l10n_do_external_service_journal "
+                "WHERE id IN %s ORDER BY date",
+                (tuple(batch),),
+            )
+            for params, payload, date in self.env.cr.fetchall():
+                yield json.loads(params), journal.decompress(payload), date
+
+    @api.autovacuum
+    def _gc_journal(self):
+        days = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("indexa.journal.retention_days", 90)
+        )
+        self.env.cr.execute(
+            "DELETE FROM l10n_do_external_service_journal WHERE date < %s",
+            (fields.Datetime.now() - timedelta(days=float(days)),),
+        )
@@ -0,0 +1,265 @@
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api
+
+from ..tools.metrics import LATENCY_BUCKETS
+
+# Fields holding the latency histogram, one per LATENCY_BUCKETS bound
+# plus the overflow bucket
+BUCKET_FIELDS = (
+    "le_100ms",
+    "le_250ms",
+    "le_500ms",
+    "le_1s",
+    "le_2500ms",
+    "le_5s",
+    "le_10s",
+    "le_inf",
+)
+
+COUNTER_FIELDS = (
+    "count",
+    "duration",
+    "retries",
+    "payload_size",
+    "cache_hits",
+    "cache_misses",
+) + BUCKET_FIELDS
+
+# Period of the rows holding the totals of the periods removed by
+# _gc_metrics, so the exported counters never decrease
+ROLLUP_PERIOD = datetime(1970, 1, 1)
+
+
+class ExternalServiceMetric(models.Model):
+    _name = "l10n_do.external.service.metric"
+    _description = "External Service Metrics"
+    _order = "period desc, service, company_id, status"
+
+    period = fields.Datetime(required=True, index=True, readonly=True)
+    service = fields.Char(required=True, readonly=True)
+    company_id = fields.Many2one(
+        "res.company", required=True, readonly=True, ondelete="cascade"
+    )
+    status = fields.Char(
+        required=True,
+        readonly=True,
+        help="HTTP status code, error when the service couldn't be reached, "
+        "circuit_open when the call was skipped or cache for local lookups.",
+    )
+    count = fields.Integer("Calls", readonly=True, group_operator="sum")
+    duration = fields.Float("Duration (s)", readonly=True, group_operator="sum")
+    retries = fields.Integer(readonly=True, group_operator="sum")
+    payload_size = fields.Integer(
+        "Payload Size (bytes)", readonly=True, group_operator="sum"
+    )
+    cache_hits = fields.Integer(readonly=True, group_operator="sum")
+    cache_misses = fields.Integer(readonly=True, group_operator="sum")
+    le_100ms = fields.Integer("<= 100ms", readonly=True)
+    le_250ms = fields.Integer("<= 250ms", readonly=True)
+    le_500ms = fields.Integer("<= 500ms", readonly=True)
+    le_1s = fields.Integer("<= 1s", readonly=True)
+    le_2500ms = fields.Integer("<= 2.5s", readonly=True)
+    le_5s = fields.Integer("<= 5s", readonly=True)
+    le_10s = fields.Integer("<= 10s", readonly=True)
+    le_inf = fields.Integer("> 10s", readonly=True)
+    rollup = fields.Boolean(
+        readonly=True,
+        help="Totals of the periods removed after the retention days.",
+    )
+
+    _sql_constraints = [
+        (
+            "period_uniq",
+            "unique(period, service, company_id, status)",
+            "Metrics are stored once per period, service, company and status.",
+        ),
+    ]
+
+    @api.model
+    def _add(self, entries):
+        """
+        Add buffered counters to the rows of the current hour, creating
+        them when missing.
+
+        :param entries: dict as returned by tools.metrics.pop()
+        """
+        now = fields.Datetime.now()
+        period = now.replace(minute=0, second=0, microsecond=0)
+        values = []
+        for (service, company_id, status), counters in entries.items():
+            values.append(
+                (period, service, company_id, status)
+                + tuple(counters[name] for name in COUNTER_FIELDS[:6])
+                + tuple(counters["buckets"])
+                + (self.env.uid, now, self.env.uid, now)
+            )
+        columns = ", ".join(COUNTER_FIELDS)
+        increments = ", ".join(
+            "%s = metric.%s + EXCLUDED.%s" % (name, name, name)
+            for name in COUNTER_FIELDS
+        )
+        execute_values(
+            self.env.cr._obj,
+            """
+            INSERT INTO l10n_do_external_service_metric AS metric (
+                period, service, company_id, status, {columns},
+                create_uid, create_date, write_uid, write_date
+            )
+            VALUES %s
+            ON CONFLICT (period, service, company_id, status) DO UPDATE
+            SET {increments},
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            """.format(
+                columns=columns, increments=increments
+            ),
+            values,
+        )
+
+    @api.model
+    def _render_prometheus(self):
+        """
+        :return: string, totals of the stored metrics in the Prometheus
+        text exposition format
+        """
+        self.env.cr.execute(
+            """
+            SELECT service, company_id, status, {sums}
+            FROM l10n_do_external_service_metric
+            GROUP BY service, company_id, status
+            ORDER BY service, company_id, status
+            """.format(
+                sums=", ".join("SUM(%s)" % name for name in COUNTER_FIELDS)
+            )
+        )
+        rows = self.env.cr.fetchall()
+
+        lines = []
+
+        def add_metric(name, metric_type, help_text, samples):
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, metric_type))
+            lines.extend(samples)
+
+        def sample(name, labels, value):
+            return "%s{%s} %s" % (
+                name,
+                ",".join('%s="%s"' % label for label in labels),
+                value,
+            )
+
+        requests, cache = [], []
+        for service, company_id, status, *counters in rows:
+            counters = dict(zip(COUNTER_FIELDS, counters))
+            labels = [("service", service), ("company", company_id)]
+            if status == "cache":
+                cache.append((labels, counters))
+            else:
+                requests.append((labels + [("status", status)], counters))
+
+        histogram = []
+        for labels, counters in requests:
+            cumulative = 0
+            bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+            for bound, name in zip(bounds, BUCKET_FIELDS):
+                cumulative += counters[name]
+                histogram.append(
+                    sample(
+                        "indexa_http_request_duration_seconds_bucket",
+                        labels + [("le", bound)],
+                        cumulative,
+                    )
+                )
+            histogram.append(
+                sample(
+                    "indexa_http_request_duration_seconds_sum",
+                    labels,
+                    counters["duration"],
+                )
+            )
+            histogram.append(
+                sample(
+                    "indexa_http_request_duration_seconds_count",
+                    labels,
+                    counters["count"],
+                )
+            )
+        add_metric(
+            "indexa_http_request_duration_seconds",
+            "histogram",
+            "External service calls duration, retries included.",
+            histogram,
+        )
+        for name, field, help_text, samples in (
+            ("indexa_http_retries_total", "retries", "Retried calls.", requests),
+            (
+                "indexa_http_response_bytes_total",
+                "payload_size",
+                "Response payload size.",
+                requests,
+            ),
+            ("indexa_cache_hits_total", "cache_hits", "Local cache hits.", cache),
+            (
+                "indexa_cache_misses_total",
+                "cache_misses",
+                "Local cache misses.",
+                cache,
+            ),
+        ):
+            add_metric(
+                name,
+                "counter",
+                help_text,
+                [sample(name, labels, counters[field]) for labels, counters in samples],
+            )
+        return "\n".join(lines) + "\n"
+
+    @api.autovacuum
+    def _gc_metrics(self):
+        """
+        Remove the rows older than the retention days. Their counters are
+        first added to the rollup rows, which are never removed, so the
+        totals exported by _render_prometheus() keep growing.
+        """
+        days = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("indexa.metrics.retention_days", 30)
+        )
+        limit = fields.Datetime.now() - timedelta(days=float(days))
+        now = fields.Datetime.now()
+        self.env.cr.execute(
+            """
+            INSERT INTO l10n_do_external_service_metric AS metric (
+                period, service, company_id, status, rollup, {columns},
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT %s, service, company_id, status, true, {sums},
+                %s, %s, %s, %s
+            FROM l10n_do_external_service_metric
+            WHERE period < %s AND rollup IS NOT TRUE
+            GROUP BY service, company_id, status
+            ON CONFLICT (period, service, company_id, status) DO UPDATE
+            SET {increments},
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            """.format(
+                columns=", ".join(COUNTER_FIELDS),
+                sums=", ".join("SUM(%s)" % name for name in COUNTER_FIELDS),
+                increments=", ".join(
+                    "%s = metric.%s + EXCLUDED.%s" % (name, name, name)
+                    for name in COUNTER_FIELDS
+                ),
+            ),
+            (ROLLUP_PERIOD, self.env.uid, now, self.env.uid, now, limit),
+        )
+        self.env.cr.execute(
+            """
+            DELETE FROM l10n_do_external_service_metric
+            WHERE period < %s AND rollup IS NOT TRUE
+            """,
+            (limit,),
+        )
@@ -0,0 +1,15 @@
+from odoo import models, fields
+
+
+class ExternalServiceQuota(models.Model):
+    _name = "l10n_do.external.service.quota"
+    _description = "External Service Rate Limit Bucket"
+    _rec_name = "key"
+
+    key = fields.Char(required=True, readonly=True)
+    tokens = fields.Float(readonly=True)
+    updated_at = fields.Datetime(readonly=True)
+
+    _sql_constraints = [
+        ("key_uniq", "unique(key)", "A rate limit bucket key must be unique."),
+    ]
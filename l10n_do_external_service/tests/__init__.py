@@ -0,0 +1,4 @@
+from . import test_decoders
+from . import test_metrics
+from . import test_rate_limiter
+from . import test_http_client
@@ -0,0 +1,198 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+_logger = logging.getLogger(__name__)
+
+MOCK_TOKEN = "mock-token"
+
+RATE_CURRENCIES = ("doll", "euro", "cdol", "poun", "swis")
+RATE_BASES = {"doll": 58.0, "euro": 63.0, "cdol": 43.0, "poun": 74.0, "swis": 64.0}
+
+
+def mock_rates(params):
+    """Deterministic rates per bank, so medians and fallbacks are checkable."""
+    offset = sum(map(ord, params.get("bank", ""))) % 10 / 10.0
+    data = []
+    for prefix in RATE_CURRENCIES:
+        rate = RATE_BASES[prefix] + offset
+        data.append({"name": prefix + "buyrate", "rate": "%.2f" % rate})
+        data.append({"name": prefix + "sellrate", "rate": "%.2f" % (rate + 0.5)})
+    return 200, {"status": "success", "data": data}
+
+
+def mock_rnc(params):
+    vat = params.get("rnc", "")
+    return 200, {
+        "status": "success",
+        "data": [
+            {
+                "rnc": vat,
+                "business_name": "CONTRIBUYENTE %s SRL" % vat,
+                "tradename": "CONTRIBUYENTE %s" % vat,
+                "street": "CALLE 4",
+                "street_number": "18",
+                "sector": "LOS RESTAURADORES",
+                "phone": "8095550000",
+                "economic_activity": "VENTA DE SOFTWARE",
+                "state": "ACTIVO",
+                "payment_regime": "NORMAL",
+                "constitution_date": "2018-07-20",
+            }
+        ],
+    }
+
+
+def mock_ncf(params):
+    return 200, {"valid": params.get("ncf", "")[:1] in ("B", "E")}
+
+
+class _MockServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        endpoint = url.path.strip("/")
+        server.count(endpoint)
+        if server.latency:
+            time.sleep(server.latency)
+
+        if endpoint not in server.routes:
+            status, body = 404, {"status": "error", "message": "Not Found"}
+        elif self.headers.get("x-access-token") != server.token:
+            status, body = 403, {"status": "error", "message": "Forbidden"}
+        elif server.error_rate and server.random.random() < server.error_rate:
+            status, body = 503, {"status": "error", "message": "Unavailable"}
+        else:
+            status, body = server.routes[endpoint](dict(parse_qsl(url.query)))
+
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockServiceServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Indexa rates, rnc and ncf endpoints, served
+    from a background thread on a random port.
+
+    :param latency: seconds slept before answering each request
+    :param error_rate: share of requests, 0 to 1, answered with a 503
+    :param seed: random seed of the errors, for reproducible runs
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None):
+        super().__init__(("127.0.0.1", 0), _MockServiceHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.token = MOCK_TOKEN
+        self.routes = {"rates": mock_rates, "rnc": mock_rnc, "ncf": mock_ncf}
+        self.calls = Counter()
+        self._calls_lock = threading.Lock()
+        self._thread = None
+
+    def url(self, endpoint):
+        return "http://%s:%s/%s" % (self.server_address + (endpoint,))
+
+    def count(self, endpoint):
+        with self._calls_lock:
+            self.calls[endpoint] += 1
+
+    def reset(self):
+        with self._calls_lock:
+            self.calls.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+class MockServiceCase(object):
+    """
+    Test case mixin pointing the external services parameters to a
+    MockServiceServer. Use it before the Odoo test case class, Eg:
+    class MyTest(MockServiceCase, TransactionCase)
+    """
+
+    mock_latency = 0.0
+    mock_error_rate = 0.0
+    mock_params = {
+        "rates": ("indexa.api.url", "indexa.api.token"),
+        "rnc": ("rnc.indexa.api.url", "rnc.indexa.api.token"),
+        "ncf": ("ncf.api.url", "ncf.api.token"),
+    }
+    # Quick retries and no circuit breaker, so error rate runs stay short
+    # and a test can't open the circuit of the next one. No rate limiting,
+    # its buckets are committed by cursors of their own
+    mock_http_params = {
+        "indexa.http.backoff_factor": "0.01",
+        "indexa.http.breaker_threshold": "0",
+        "indexa.ratelimit.rate": "0",
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super(MockServiceCase, cls).setUpClass()
+        cls.mock_server = MockServiceServer(cls.mock_latency, cls.mock_error_rate, 0)
+        cls.mock_server.start()
+        set_param = cls.env["ir.config_parameter"].sudo().set_param
+        for endpoint, (url_key, token_key) in cls.mock_params.items():
+            set_param(url_key, cls.mock_server.url(endpoint))
+            set_param(token_key, MOCK_TOKEN)
+        for key, value in cls.mock_http_params.items():
+            set_param(key, value)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.mock_server.stop()
+        super(MockServiceCase, cls).tearDownClass()
+
+    @contextmanager
+    def benchmark(self, label, items=1):
+        """
+        Measure the wrapped block: duration, HTTP calls per endpoint and
+        SQL queries. The figures are logged and set on the yielded dict.
+        """
+        self.env["base"].flush()
+        self.mock_server.reset()
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        stats = {}
+        yield stats
+        self.env["base"].flush()
+        stats.update(
+            duration=time.perf_counter() - start,
+            http_calls=dict(self.mock_server.calls),
+            queries=self.cr.sql_log_count - queries,
+        )
+        _logger.info(
+            "Benchmark %s: %.3fs for %s items (%.1f/s), HTTP calls %s, "
+            "SQL queries %s",
+            label,
+            stats["duration"],
+            items,
+            items / stats["duration"] if stats["duration"] else 0,
+            stats["http_calls"],
+            stats["queries"],
+        )
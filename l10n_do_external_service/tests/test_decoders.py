@@ -0,0 +1,72 @@
+import logging
+import time
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+from odoo.tools.safe_eval import safe_eval
+
+from ..tools import decoders
+
+_logger = logging.getLogger(__name__)
+
+RATES_RESPONSE = (
+    '{"status": "success", "data": ['
+    '{"name": "dollarbuyrate", "rate": "58.10"}, '
+    '{"name": "dollarsellrate", "rate": "58.45"}, '
+    '{"name": "eurobuyrate", "rate": "63.02"}, '
+    '{"name": "eurosellrate", "rate": null}]}'
+)
+
+
+@tagged("post_install", "-at_install")
+class DecodersTest(BaseCase):
+    def test_001_decode_rates(self):
+        response = decoders.decode_rates(RATES_RESPONSE)
+        self.assertEqual(response.status, "success")
+        self.assertEqual(response.rates[1], decoders.RateEntry("dollarsellrate", 58.45))
+        self.assertIsNone(response.rates[3].rate)
+
+        with self.assertRaises(decoders.DecodeError):
+            decoders.decode_rates('{"data": [{"name": "dollarsellrate", "rate": "x"}]}')
+        with self.assertRaises(decoders.DecodeError):
+            decoders.decode_rates("<html>Bad Gateway</html>")
+
+    def test_002_decode_contact_and_ncf(self):
+        contact = decoders.decode_contact(
+            b'{"status": "success", "data": [{"business_name": "INDEXA SRL"}]}'
+        )
+        self.assertEqual(contact.data[0]["business_name"], "INDEXA SRL")
+        self.assertEqual(decoders.decode_contact(b'{"status": "error"}').data, [])
+        with self.assertRaises(decoders.DecodeError):
+            decoders.decode_contact(b'{"data": [{"rnc": "131793916"}]}')
+
+        self.assertTrue(decoders.decode_ncf(b'{"valid": true}').valid)
+        self.assertFalse(decoders.decode_ncf(b"{}").valid)
+        with self.assertRaises(decoders.DecodeError):
+            decoders.decode_ncf(b'{"valid": "yes"}')
+        with self.assertRaises(decoders.DecodeError):
+            decoders.decode_ncf(None)
+
+    def test_003_benchmark_ncf_decoding(self):
+        """Per call parse cost of the decoder vs the former safe_eval path."""
+        content = '{"valid": true, "ncf": "B0100000001", "rnc": "131793916"}'
+        iterations = 2000
+
+        start = time.perf_counter()
+        for _i in range(iterations):
+            text = content.replace("true", "True").replace("false", "False")
+            safe_eval(text).get("valid", False)
+        safe_eval_cost = (time.perf_counter() - start) / iterations
+
+        start = time.perf_counter()
+        for _i in range(iterations):
+            decoders.decode_ncf(content).valid
+        decoder_cost = (time.perf_counter() - start) / iterations
+
+        _logger.info(
+            "NCF response parse cost: safe_eval %.1fµs, decoders %.1fµs (%s)",
+            safe_eval_cost * 1e6,
+            decoder_cost * 1e6,
+            "orjson" if decoders.orjson else "json",
+        )
+        self.assertLess(decoder_cost, safe_eval_cost)
@@ -0,0 +1,96 @@
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..tools import http_client
+
+
+def _response(status):
+    response = MagicMock(spec=requests.Response)
+    response.status_code = status
+    response.content = b"{}"
+    response.headers = {}
+    return response
+
+
+@tagged("post_install", "-at_install")
+class HttpClientTest(BaseCase):
+    def setUp(self):
+        super(HttpClientTest, self).setUp()
+        # Frozen clock, moved forward by the tests, and no actual sleeping
+        self.now = 1000.0
+        clock = patch.object(http_client, "time").start()
+        clock.monotonic.side_effect = lambda: self.now
+        self.sleep = clock.sleep
+        self.addCleanup(patch.stopall)
+
+    def _client(self, responses, **config):
+        client = http_client.ServiceClient("test", **config)
+        client.session.get = MagicMock(side_effect=responses)
+        return client
+
+    def test_001_breaker_transitions(self):
+        """Open after threshold failures, half open after the reset timeout"""
+        breaker = http_client.CircuitBreaker(threshold=2, reset_timeout=60)
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertFalse(breaker.allow(), "Open once the threshold is reached")
+
+        self.now += 60
+        self.assertTrue(breaker.allow(), "Half open, a probe is let through")
+        self.assertFalse(breaker.allow(), "Only one probe per reset window")
+        breaker.failure()
+        self.assertFalse(breaker.allow(), "A failed probe keeps it open")
+
+        self.now += 60
+        self.assertTrue(breaker.allow())
+        breaker.success()
+        self.assertTrue(breaker.allow(), "A successful probe closes it")
+        self.assertTrue(breaker.allow())
+
+    def test_002_breaker_disabled(self):
+        breaker = http_client.CircuitBreaker(threshold=0, reset_timeout=60)
+        for __ in range(10):
+            breaker.failure()
+        self.assertTrue(breaker.allow())
+
+    def test_003_retry_with_backoff(self):
+        """Retry statuses and connection errors are retried with backoff"""
+        client = self._client(
+            [_response(503), requests.exceptions.ConnectionError(), _response(200)],
+            max_retries=2,
+            backoff_factor=0.5,
+        )
+        with patch.object(
+            http_client.random, "uniform", side_effect=lambda a, b: b
+        ) as uniform:
+            response = client.get("http://service.test")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.session.get.call_count, 3)
+        self.assertEqual([c.args for c in uniform.call_args_list], [(0, 1), (0, 2)])
+        self.assertEqual([c.args[0] for c in self.sleep.call_args_list], [1, 2])
+
+        # Client errors aren't retried
+        client = self._client([_response(404)])
+        self.assertEqual(client.get("http://service.test").status_code, 404)
+        self.assertEqual(client.session.get.call_count, 1)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_004_retries_exhausted(self):
+        """Exhausted retries count as a failure, then calls fail fast"""
+        client = self._client(
+            [requests.exceptions.Timeout()] * 2 + [_response(503)] * 2,
+            max_retries=1,
+            breaker_threshold=2,
+            breaker_reset=60,
+        )
+        with self.assertRaises(requests.exceptions.Timeout):
+            client.get("http://service.test")
+        self.assertEqual(client.get("http://service.test").status_code, 503)
+        with self.assertRaises(http_client.CircuitOpenError):
+            client.get("http://service.test")
+        self.assertEqual(client.session.get.call_count, 4)
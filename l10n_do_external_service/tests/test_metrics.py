@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+from ..tools import metrics
+
+
+@tagged("post_install", "-at_install")
+class MetricsTest(TransactionCase):
+    def setUp(self):
+        super(MetricsTest, self).setUp()
+        self.Metric = self.env["l10n_do.external.service.metric"]
+        # Rows stored by other tests calls, rolled back with the test
+        self.env.cr.execute("DELETE FROM l10n_do_external_service_metric")
+        self.env["ir.config_parameter"].sudo().set_param(
+            "indexa.metrics.retention_days", 30
+        )
+
+    def _add(self, status, duration):
+        counters = metrics._new_counters()
+        counters["count"] = 1
+        counters["duration"] = duration
+        counters["buckets"][0] = 1
+        self.Metric._add({("rnc", self.env.company.id, status): counters})
+
+    def _age_rows(self, days):
+        self.env.cr.execute(
+            "UPDATE l10n_do_external_service_metric SET period = period - %s",
+            (timedelta(days=days),),
+        )
+
+    def test_001_counters_survive_gc(self):
+        """Exported counters never decrease after removing old rows"""
+        self._add("200", 0.05)
+        before = self.Metric._render_prometheus()
+        self._age_rows(40)
+        self.Metric._gc_metrics()
+        self.assertEqual(self.Metric._render_prometheus(), before)
+        self.assertFalse(
+            self.Metric.search([("period", ">", "1970-01-01 00:00:00")]),
+            "Expired rows are removed",
+        )
+
+        self._add("200", 0.05)
+        self._age_rows(40)
+        self.Metric._gc_metrics()
+        self.assertIn(
+            'indexa_http_request_duration_seconds_count{service="rnc",'
+            'company="%s",status="200"} 2' % self.env.company.id,
+            self.Metric._render_prometheus(),
+        )
+        rollup = self.Metric.search([("rollup", "=", True)])
+        self.assertEqual(len(rollup), 1)
+        self.assertEqual(rollup.count, 2)
+
+    def test_002_recent_rows_kept(self):
+        """Rows within the retention days are not rolled up"""
+        self._add("200", 0.05)
+        self.Metric._gc_metrics()
+        rows = self.Metric.search([])
+        self.assertEqual(len(rows), 1)
+        self.assertFalse(rows.rollup)
+        self.assertGreater(rows.period, fields.Datetime.now() - timedelta(days=1))
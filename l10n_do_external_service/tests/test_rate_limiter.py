@@ -0,0 +1,64 @@
+import time
+import uuid
+
+from odoo import sql_db
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+from ..tools import rate_limiter
+from ..tools.rate_limiter import PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+
+@tagged("post_install", "-at_install")
+class RateLimiterTest(TransactionCase):
+    def _get_limiter(self, rate, burst, reserve=0.0, max_wait=60):
+        # The limiter commits its bucket in its own cursor, remove it after
+        key = "test-%s" % uuid.uuid4().hex
+        self.addCleanup(self._remove_bucket, key)
+        return rate_limiter.RateLimiter(
+            self.env.cr.dbname, key, rate, burst, reserve=reserve, max_wait=max_wait
+        )
+
+    def _remove_bucket(self, key):
+        with sql_db.db_connect(self.env.cr.dbname).cursor() as cr:
+            cr.execute(
+                "DELETE FROM l10n_do_external_service_quota WHERE key = %s", (key,)
+            )
+
+    def test_001_token_refill(self):
+        """Tokens are refilled at the configured rate once the bucket is empty"""
+        limiter = self._get_limiter(rate=20, burst=2)
+        self.assertEqual(limiter._take(PRIORITY_INTERACTIVE), 0)
+        self.assertEqual(limiter._take(PRIORITY_INTERACTIVE), 0)
+        wait = limiter._take(PRIORITY_INTERACTIVE)
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 1 / 20.0)
+        time.sleep(0.1)
+        self.assertEqual(limiter._take(PRIORITY_INTERACTIVE), 0)
+
+    def test_002_interactive_reserve(self):
+        """Bulk callers can't take the share reserved for interactive ones"""
+        limiter = self._get_limiter(rate=0.001, burst=4, reserve=0.5)
+        self.assertEqual(limiter._take(PRIORITY_BULK), 0)
+        self.assertEqual(limiter._take(PRIORITY_BULK), 0)
+        self.assertGreater(limiter._take(PRIORITY_BULK), 0)
+        self.assertEqual(limiter._take(PRIORITY_INTERACTIVE), 0)
+        self.assertEqual(limiter._take(PRIORITY_INTERACTIVE), 0)
+        self.assertGreater(limiter._take(PRIORITY_INTERACTIVE), 0)
+
+    def test_003_acquire_timeout(self):
+        """Calls are let through after waiting max_wait seconds for a token"""
+        limiter = self._get_limiter(rate=0.001, burst=1, max_wait=0.2)
+        self.assertLess(limiter.acquire(), 0.2)
+        with self.assertLogs(rate_limiter.__name__, level="WARNING"):
+            waited = limiter.acquire(PRIORITY_BULK)
+        self.assertGreaterEqual(waited, 0.2)
+        self.assertLess(waited, 1)
+
+    def test_004_shared_quota(self):
+        """Every Indexa service takes its tokens from the same bucket"""
+        self.env["ir.config_parameter"].sudo().set_param("indexa.ratelimit.rate", 10)
+        Service = self.env["l10n_do.external.service"]
+        keys = {Service._get_rate_limiter(name).key for name in ("rnc", "ncf", "rates")}
+        self.assertEqual(len(keys), 1)
+        self.assertIsNone(Service._get_rate_limiter("other"))
@@ -0,0 +1,5 @@
+from . import decoders
+from . import http_client
+from . import journal
+from . import metrics
+from . import rate_limiter
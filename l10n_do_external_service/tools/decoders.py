@@ -0,0 +1,102 @@
+import json
+import logging
+from collections import namedtuple
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except (ImportError, IOError) as err:
+    orjson = None
+    _logger.debug(err)
+
+
+class DecodeError(ValueError):
+    """Raised when a service response is not JSON or doesn't match its schema."""
+
+
+RateEntry = namedtuple("RateEntry", ["name", "rate"])
+RatesResponse = namedtuple("RatesResponse", ["status", "rates"])
+ContactResponse = namedtuple("ContactResponse", ["status", "data"])
+NcfResponse = namedtuple("NcfResponse", ["valid"])
+
+
+def loads(content):
+    """
+    Parse a JSON document with orjson when available, json otherwise.
+
+    :param content: str or bytes
+    :raise DecodeError: if content is not valid JSON
+    """
+    if not isinstance(content, (str, bytes, bytearray)):
+        raise DecodeError("No serializable data from API response")
+    try:
+        if orjson:
+            return orjson.loads(content)
+        return json.loads(content)
+    except ValueError as e:
+        raise DecodeError("Invalid JSON in API response: %s" % e)
+
+
+def _load_object(content):
+    data = loads(content)
+    if not isinstance(data, dict):
+        raise DecodeError("API response is not a JSON object")
+    return data
+
+
+def _load_records(data, key="data"):
+    records = data.get(key) or []
+    if not isinstance(records, list) or not all(
+        isinstance(record, dict) for record in records
+    ):
+        raise DecodeError("API response %s is not a list of objects" % key)
+    return records
+
+
+def decode_rates(content):
+    """
+    Decode a rates service response.
+    Eg: {"status": "success", "data": [{"name": "dollarsellrate", "rate": "58.2"}]}
+
+    :return: RatesResponse, rates being a list of RateEntry with float rate,
+    None when the service didn't give one
+    """
+    data = _load_object(content)
+    rates = []
+    for record in _load_records(data):
+        if "name" not in record:
+            raise DecodeError("API response rate without name")
+        try:
+            rate = float(record["rate"]) if record.get("rate") else None
+        except (TypeError, ValueError):
+            raise DecodeError("API response rate %r is not a number" % record["rate"])
+        rates.append(RateEntry(str(record["name"]), rate))
+    return RatesResponse(data.get("status"), rates)
+
+
+def decode_contact(content):
+    """
+    Decode a RNC service response.
+    Eg: {"status": "success", "data": [{"rnc": "131793916", ...}]}
+
+    :return: ContactResponse, data being the list of contact dicts
+    """
+    data = _load_object(content)
+    records = _load_records(data)
+    if any("business_name" not in record for record in records):
+        raise DecodeError("API response contact without business_name")
+    return ContactResponse(data.get("status"), records)
+
+
+def decode_ncf(content):
+    """
+    Decode a NCF service response. Eg: {"valid": true}
+
+    :return: NcfResponse
+    """
+    data = _load_object(content)
+    valid = data.get("valid", False)
+    if not isinstance(valid, bool):
+        raise DecodeError("API response valid %r is not a boolean" % valid)
+    return NcfResponse(valid)
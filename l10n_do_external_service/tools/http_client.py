@@ -0,0 +1,246 @@
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import journal, metrics
+
+_logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_clients_lock = threading.Lock()
+_clients = {}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a service whose circuit is open."""
+
+
+class CircuitBreaker(object):
+    """
+    Counts consecutive failures of a service. Once threshold is reached
+    the circuit opens and calls fail fast until reset_timeout seconds have
+    passed, then a single probe call is let through to close it again.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half open, restart the window so only this call probes
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.threshold and self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+class ServiceClient(object):
+    """
+    Thread safe HTTP client of an external service: a pooled keep-alive
+    session with timeouts, jittered exponential retries for GET requests
+    and a circuit breaker.
+    """
+
+    def __init__(
+        self,
+        name,
+        connect_timeout=5,
+        read_timeout=30,
+        max_retries=2,
+        backoff_factor=0.5,
+        breaker_threshold=5,
+        breaker_reset=60,
+        pool_size=10,
+    ):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def bind(self, *labels, limiter=None, priority=None, journal=False):
+        """
+        :param labels: metrics labels, Eg: (dbname, service, company_id)
+        :param limiter: rate_limiter.RateLimiter each call must get a token from
+        :param priority: rate limiter priority class of the calls
+        :param journal: keep the responses in tools.journal
+        :return: BoundClient recording the calls it makes under labels
+        """
+        return BoundClient(self, labels, limiter, priority, journal)
+
+    def _record(
+        self,
+        labels,
+        start,
+        retries=0,
+        response=None,
+        stream=False,
+        status=None,
+        journal_request=None,
+    ):
+        if labels is None:
+            return
+        duration = time.monotonic() - start
+        size = 0
+        if response is not None:
+            status = response.status_code
+            if stream:
+                # Don't consume streamed bodies, rely on the declared length
+                size = int(response.headers.get("Content-Length") or 0)
+            else:
+                size = len(response.content)
+                if journal_request:
+                    url, params = journal_request
+                    journal.record_response(
+                        labels, url, params, status, duration, response.content
+                    )
+        metrics.record_request(labels, status, duration, retries, size)
+
+    def get(
+        self, url, params=None, headers=None, labels=None, journal=False, **kwargs
+    ):
+        """
+        Same as requests.get(), retrying connection errors, timeouts and
+        RETRY_STATUSES responses.
+
+        :param labels: when given, the call is recorded in tools.metrics
+        :param journal: when True, with labels, the response is kept in
+        tools.journal, except streamed ones
+        :raise CircuitOpenError: while the service is considered down
+        :raise requests.exceptions.RequestException: when retries run out
+        """
+        start = time.monotonic()
+        stream = kwargs.get("stream", False)
+        journal_request = (url, params) if journal else None
+        if not self.breaker.allow():
+            self._record(labels, start, status="circuit_open")
+            raise CircuitOpenError(
+                "%s service is unavailable, request skipped" % self.name
+            )
+
+        attempt = 0
+        while True:
+            error = response = None
+            try:
+                response = self.session.get(
+                    url,
+                    params=params,
+                    headers=headers,
+                    timeout=self.timeout,
+                    **kwargs
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.success()
+                    self._record(
+                        labels,
+                        start,
+                        attempt,
+                        response,
+                        stream,
+                        journal_request=journal_request,
+                    )
+                    return response
+
+            if attempt >= self.max_retries:
+                self.breaker.failure()
+                if error:
+                    self._record(labels, start, attempt, status="error")
+                    raise error
+                self._record(
+                    labels,
+                    start,
+                    attempt,
+                    response,
+                    stream,
+                    journal_request=journal_request,
+                )
+                return response
+
+            attempt += 1
+            delay = random.uniform(0, self.backoff_factor * 2 ** attempt)
+            _logger.info(
+                "Retrying %s request in %.2fs (attempt %s): %s",
+                self.name,
+                delay,
+                attempt,
+                error or response.status_code,
+            )
+            time.sleep(delay)
+
+
+class BoundClient(object):
+    """
+    ServiceClient view recording every call under its metrics labels and,
+    with a limiter, waiting for a rate limit token before each call.
+    """
+
+    def __init__(self, client, labels, limiter=None, priority=None, journal=False):
+        self.client = client
+        self.labels = labels
+        self.limiter = limiter
+        self.priority = priority
+        self.journal = journal
+
+    @property
+    def name(self):
+        return self.client.name
+
+    @property
+    def timeout(self):
+        return self.client.timeout
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        if self.limiter:
+            self.limiter.acquire(self.priority)
+        return self.client.get(
+            url, params, headers, labels=self.labels, journal=self.journal, **kwargs
+        )
+
+
+def get_client(name, **config):
+    """
+    Return this process client of the given service, creating it on the
+    first call or when its configuration changed. Clients are keyed by
+    pid, so sessions are never shared between forked workers.
+    """
+    key = (os.getpid(), name)
+    with _clients_lock:
+        client, client_config = _clients.get(key, (None, None))
+        if client is None or client_config != config:
+            client = ServiceClient(name, **config)
+            _clients[key] = (client, config)
+        return client
@@ -0,0 +1,64 @@
+import json
+import logging
+import threading
+import zlib
+from datetime import datetime
+
+_logger = logging.getLogger(__name__)
+
+# Entries kept per worker between two flushes, older ones are dropped
+MAX_BUFFERED = 5000
+
+_lock = threading.Lock()
+# {dbname: [entry tuple]}
+_buffer = {}
+
+
+def record_response(labels, url, params, status, duration, content):
+    """
+    Keep a compressed copy of a service response until the next flush.
+    Past MAX_BUFFERED entries, the oldest one is dropped.
+
+    :param labels: tuple (dbname, service, company_id)
+    """
+    dbname, service, company_id = labels
+    entry = (
+        datetime.utcnow(),
+        service,
+        company_id,
+        url,
+        json.dumps(params or {}, sort_keys=True, default=str),
+        str(status),
+        duration,
+        len(content or b""),
+        zlib.compress(content or b""),
+    )
+    with _lock:
+        entries = _buffer.setdefault(dbname, [])
+        entries.append(entry)
+        if len(entries) > MAX_BUFFERED:
+            del entries[0]
+            _logger.warning("External service journal buffer full, entry dropped")
+
+
+def pop(dbname):
+    """
+    Remove and return the buffered entries of a database.
+
+    :return: list of tuples (date, service, company_id, url, params, status,
+    duration, payload_size, payload)
+    """
+    with _lock:
+        return _buffer.pop(dbname, [])
+
+
+def restore(dbname, entries):
+    """Put back entries returned by pop() that couldn't be stored."""
+    with _lock:
+        buffered = _buffer.setdefault(dbname, [])
+        buffered[:0] = entries
+        del buffered[: max(len(buffered) - MAX_BUFFERED, 0)]
+
+
+def decompress(payload):
+    return zlib.decompress(bytes(payload)) if payload else b""
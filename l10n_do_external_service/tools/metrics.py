@@ -0,0 +1,96 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds of the latency histogram buckets, the last
+# bucket counts calls slower than all of them
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+# {(dbname, service, company_id, status): counters dict}
+_buffer = {}
+_last_flush = {}
+
+
+def _new_counters():
+    return {
+        "count": 0,
+        "duration": 0.0,
+        "retries": 0,
+        "payload_size": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+def _get_counters(labels, status):
+    key = tuple(labels) + (str(status),)
+    counters = _buffer.get(key)
+    if counters is None:
+        counters = _buffer[key] = _new_counters()
+    return counters
+
+
+def record_request(labels, status, duration, retries=0, size=0):
+    """
+    Add an external service call to this process counters of its
+    labels and status, stored by the next flush.
+
+    :param labels: tuple (dbname, service, company_id)
+    :param status: HTTP status code, error or circuit_open
+    :param duration: seconds spent, retries included
+    """
+    with _lock:
+        counters = _get_counters(labels, status)
+        counters["count"] += 1
+        counters["duration"] += duration
+        counters["retries"] += retries
+        counters["payload_size"] += size
+        counters["buckets"][bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+
+def record_cache(labels, hits=0, misses=0):
+    """Account lookups served from, or missed by, a local cache."""
+    if not hits and not misses:
+        return
+    with _lock:
+        counters = _get_counters(labels, "cache")
+        counters["cache_hits"] += hits
+        counters["cache_misses"] += misses
+
+
+def flush_due(dbname, interval):
+    """
+    :return: True once every interval seconds per database, the caller is
+    then expected to pop() and store the buffered metrics
+    """
+    now = time.monotonic()
+    with _lock:
+        if now - _last_flush.setdefault(dbname, now) < interval:
+            return False
+        _last_flush[dbname] = now
+        return True
+
+
+def pop(dbname):
+    """
+    Remove and return the buffered metrics of a database.
+
+    :return: dict {(service, company_id, status): counters dict}
+    """
+    with _lock:
+        keys = [key for key in _buffer if key[0] == dbname]
+        return {key[1:]: _buffer.pop(key) for key in keys}
+
+
+def restore(dbname, entries):
+    """Put back metrics returned by pop() that couldn't be stored."""
+    with _lock:
+        for key, entry in entries.items():
+            counters = _get_counters((dbname,) + key[:2], key[2])
+            for name, value in entry.items():
+                if name == "buckets":
+                    counters[name] = [a + b for a, b in zip(counters[name], value)]
+                else:
+                    counters[name] += value
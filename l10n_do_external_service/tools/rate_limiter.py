@@ -0,0 +1,108 @@
+import logging
+import time
+
+import psycopg2
+
+from odoo import sql_db
+
+_logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by every worker and thread of a database, stored in
+    the l10n_do_external_service_quota table. Each acquisition locks the
+    bucket row in its own short transaction, so concurrent callers are
+    serialized by PostgreSQL without holding their own transaction locks.
+
+    Bulk callers can't take the share of the bucket reserved for
+    interactive ones, so a partner import doesn't starve invoice posting.
+
+    :param rate: tokens refilled per second
+    :param burst: bucket capacity
+    :param reserve: share of burst, 0 to 1, only interactive callers can use
+    :param max_wait: seconds to wait for a token before letting the call
+    through anyway, the service rate limit response is then retried by the
+    client
+    """
+
+    def __init__(self, dbname, key, rate, burst, reserve=0.0, max_wait=60):
+        self.dbname = dbname
+        self.key = key
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.reserve = min(max(reserve, 0), 1) * self.burst
+        self.max_wait = max_wait
+
+    def _take(self, priority):
+        """
+        Try to take a token.
+
+        :return: 0 if taken, otherwise seconds until one is expected
+        """
+        floor = self.reserve if priority == PRIORITY_BULK else 0
+        with sql_db.db_connect(self.dbname).cursor() as cr:
+            cr.execute(
+                """
+                INSERT INTO l10n_do_external_service_quota (key, tokens, updated_at)
+                VALUES (%s, %s, now() at time zone 'UTC')
+                ON CONFLICT (key) DO NOTHING
+                """,
+                (self.key, self.burst),
+            )
+            cr.execute(
+                """
+                SELECT tokens,
+                       EXTRACT(EPOCH FROM (now() at time zone 'UTC') - updated_at)
+                FROM l10n_do_external_service_quota
+                WHERE key = %s
+                FOR UPDATE
+                """,
+                (self.key,),
+            )
+            tokens, elapsed = cr.fetchone()
+            tokens = min(self.burst, tokens + max(elapsed, 0) * self.rate)
+            wait = 0
+            if tokens - 1 >= floor:
+                tokens -= 1
+            else:
+                wait = (floor + 1 - tokens) / self.rate
+            cr.execute(
+                """
+                UPDATE l10n_do_external_service_quota
+                SET tokens = %s, updated_at = now() at time zone 'UTC'
+                WHERE key = %s
+                """,
+                (tokens, self.key),
+            )
+        return wait
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE):
+        """
+        Block until a token is available or max_wait is reached. Thread
+        safe, it only uses its own database cursors.
+
+        :return: seconds spent waiting
+        """
+        start = time.monotonic()
+        while True:
+            try:
+                wait = self._take(priority)
+            except psycopg2.Error as e:
+                _logger.warning("Rate limiter of %s unavailable: %s", self.key, e)
+                return time.monotonic() - start
+            waited = time.monotonic() - start
+            if not wait:
+                return waited
+            if waited >= self.max_wait:
+                _logger.warning(
+                    "%s %s request waited %.1fs for the rate limit, sent anyway",
+                    priority,
+                    self.key,
+                    waited,
+                )
+                return waited
+            time.sleep(min(wait, self.max_wait - waited))
@@ -1,14 +1,17 @@
 {
     "name": "Dominican NCF Validation",
-    "version": "15.0.1.0.1",
+    "version": "15.0.1.3.0",
     "summary": "Validate NCF from external service",
     "category": "Extra Tools",
     "license": "LGPL-3",
     "author": "Indexa",
     "website": "https://www.indexa.do",
-    "depends": ["l10n_do_accounting"],
+    "depends": ["l10n_do_accounting", "l10n_do_external_service"],
     "data": [
+        "security/ir.model.access.csv",
         "data/ir_config_parameter_data.xml",
+        "data/ir_cron_data.xml",
+        "views/account_move_views.xml",
         "views/res_config_settings_views.xml",
     ],
     "installable": True,
@@ -1,17 +1,96 @@
+import logging
+import re
 import requests
-from odoo.tools.safe_eval import safe_eval
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-from odoo import models, _
+from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
+from odoo.tools.sql import create_index, index_exists
+
+from odoo.addons.l10n_do_external_service.tools import decoders
+
+_logger = logging.getLogger(__name__)
+
+try:
+    from stdnum.do import ncf as stdnum_ncf
+except (ImportError, IOError) as err:
+    _logger.debug(err)
+
+NCF_QUEUE_BATCH_SIZE = 100
+
+# NCF document type codes of credit notes
+NCF_CREDIT_NOTE_TYPES = ("04", "34")
+
+# NCF document type codes only issued by the buyer (informal suppliers,
+# minor expenses and foreign payments), never used on sales
+NCF_PURCHASE_TYPES = ("11", "13", "17", "41", "43", "47")
+
+# NCF document type codes only issued to end buyers outside the
+# Dominican tax system (single income register and exports)
+NCF_SALE_TYPES = ("12", "16", "46")
+
+ECF_SECURITY_CODE_RE = re.compile(r"^[A-Za-z0-9]{6}$")
+
+
+def _request_ncf_validation(client, api_url, token, payload):
+    """
+    Query external service for a single NCF payload.
+
+    :return: string: valid, invalid, connection_error or forbidden
+    """
+    try:
+        response = client.get(api_url, payload, headers={"x-access-token": token})
+    except requests.exceptions.RequestException:
+        return "connection_error"
+
+    if response.status_code == 403:
+        return "forbidden"
+
+    try:
+        valid = decoders.decode_ncf(response.content).valid
+    except decoders.DecodeError as e:
+        _logger.warning(e)
+        return "connection_error"
+
+    return "valid" if valid else "invalid"
 
 
 class AccountMove(models.Model):
     _inherit = "account.move"
 
-    def _has_valid_ncf(self):
+    ncf_validation_state = fields.Selection(
+        [
+            ("pending", "Pending"),
+            ("valid", "Valid"),
+            ("invalid", "Invalid"),
+            ("error", "Error"),
+        ],
+        string="NCF Validation",
+        readonly=True,
+        copy=False,
+        index=True,
+    )
+    ncf_validation_attempts = fields.Integer(readonly=True, copy=False)
+    ncf_validation_next_try = fields.Datetime(readonly=True, copy=False)
+    ncf_validation_message = fields.Text(readonly=True, copy=False)
+
+    def init(self):
+        super(AccountMove, self).init()
+        index_name = "account_move_l10n_do_fiscal_number_company_index"
+        if not index_exists(self.env.cr, index_name):
+            create_index(
+                self.env.cr,
+                index_name,
+                self._table,
+                ["l10n_do_fiscal_number", "company_id"],
+            )
+
+    def _get_ncf_validation_payload(self):
         """
-        Query external service to check NCF status
-        :return: boolean: True if valid NCF, otherwise False
+        Build the external service query of this invoice NCF
+        :return: dict: ncf, rnc and, for ECF, buyerRNC and securityCode
         """
         self.ensure_one()
 
@@ -34,7 +113,6 @@ class AccountMove(models.Model):
                 _("NCF %s has a invalid format. Please fix it and try again." % ncf)
             )
 
-        get_param = self.env["ir.config_parameter"].sudo().get_param
         payload = {"ncf": ncf, "rnc": rnc}
 
         if self.is_ecf_invoice and self.company_id.validate_ecf:
@@ -60,32 +138,209 @@ class AccountMove(models.Model):
                 }
             )
 
-        try:
-            response = requests.get(
-                get_param("ncf.api.url"),
-                payload,
-                headers={"x-access-token": get_param("ncf.api.token")},
+        return payload
+
+    @api.model
+    def _request_ncf_statuses(self, payloads):
+        """
+        Query external service for several NCF at once. Repeated payloads
+        are sent only once and requests run concurrently, bounded by
+        ncf.api.workers.
+
+        :param payloads: list of dicts as returned by _get_ncf_validation_payload
+        :return: list of _request_ncf_validation() statuses in the same order
+        """
+        keys = [tuple(sorted(payload.items())) for payload in payloads]
+        unique_keys = list(dict.fromkeys(keys))
+        if not unique_keys:
+            return []
+
+        # NCF already confirmed valid don't need another round-trip
+        NcfResult = self.env["l10n_do.ncf.validation.result"].sudo()
+        known_valid = NcfResult._get_valid(payloads)
+        statuses = {
+            key: "valid"
+            for key in unique_keys
+            if NcfResult._get_key(dict(key)) in known_valid
+        }
+        to_request = [key for key in unique_keys if key not in statuses]
+
+        if to_request:
+            client = self.env["l10n_do.external.service"]._get_http_client("ncf")
+            get_param = self.env["ir.config_parameter"].sudo().get_param
+            api_url = get_param("ncf.api.url")
+            token = get_param("ncf.api.token")
+            max_workers = int(get_param("ncf.api.workers", 8))
+            with ThreadPoolExecutor(min(max_workers, len(to_request))) as executor:
+                statuses.update(
+                    zip(
+                        to_request,
+                        executor.map(
+                            lambda key: _request_ncf_validation(
+                                client, api_url, token, dict(key)
+                            ),
+                            to_request,
+                        ),
+                    )
+                )
+            NcfResult._store_valid(
+                [dict(key) for key in to_request if statuses[key] == "valid"]
             )
-        except requests.exceptions.ConnectionError:
+
+        return [statuses[key] for key in keys]
+
+    @api.model
+    def _query_ncf_validation(self, payloads):
+        """
+        Same as _request_ncf_statuses(), raising if the service couldn't
+        be reached.
+
+        :return: list of booleans, True if valid NCF, in the same order
+        """
+        statuses = self._request_ncf_statuses(payloads)
+
+        if "connection_error" in statuses:
             raise ValidationError(
                 _(
                     "Could not establish communication with external service.\n"
                     "Try again later."
                 )
             )
-
-        if response.status_code == 403:
+        if "forbidden" in statuses:
             raise ValidationError(
                 _("Odoo couldn't authenticate with external service.")
             )
 
-        response_text = (
-            str(response.text).replace("true", "True").replace("false", "False")
+        return [status == "valid" for status in statuses]
+
+    def _has_valid_ncf(self):
+        """
+        Query external service to check NCF status
+        :return: boolean: True if valid NCF, otherwise False
+        """
+        self.ensure_one()
+        return self._query_ncf_validation([self._get_ncf_validation_payload()])[0]
+
+    def _get_ncf_local_errors(self):
+        """
+        Check the NCF of every invoice in self against the rules that don't
+        need the external service: NCF structure and checksum, document
+        type against invoice type, e-CF security code shape and duplicated
+        NCF per partner within the company.
+
+        :return: dict: {invoice: error message} of the invoices that failed
+        """
+        errors = {}
+        for invoice in self.filtered("l10n_do_fiscal_number"):
+            ncf = invoice.l10n_do_fiscal_number
+            doc_code_prefix = invoice.l10n_latam_document_type_id.doc_code_prefix
+            is_refund = invoice.move_type in ("out_refund", "in_refund")
+            if not stdnum_ncf.is_valid(ncf):
+                errors[invoice] = _("NCF %s has a invalid format.") % ncf
+            elif doc_code_prefix and not ncf.startswith(doc_code_prefix):
+                errors[invoice] = _("NCF %s doesn't match document type %s.") % (
+                    ncf,
+                    invoice.l10n_latam_document_type_id.display_name,
+                )
+            elif (ncf[1:3] in NCF_CREDIT_NOTE_TYPES) != is_refund:
+                errors[invoice] = (
+                    _("NCF %s is a credit note, but the invoice is not a refund.")
+                    if not is_refund
+                    else _("NCF %s is not a credit note, but the invoice is a refund.")
+                ) % ncf
+            elif invoice.is_sale_document() and ncf[1:3] in NCF_PURCHASE_TYPES:
+                errors[invoice] = (
+                    _("NCF %s is a purchase document type, but the invoice is a sale.")
+                    % ncf
+                )
+            elif invoice.is_purchase_document() and ncf[1:3] in NCF_SALE_TYPES:
+                errors[invoice] = (
+                    _("NCF %s is a sale document type, but the invoice is a purchase.")
+                    % ncf
+                )
+            elif (
+                ncf.startswith("E")
+                and invoice.company_id.validate_ecf
+                and not ECF_SECURITY_CODE_RE.match(
+                    invoice.l10n_do_ecf_security_code or ""
+                )
+            ):
+                errors[invoice] = _(
+                    "ECF Security Code must be a 6 character length alphanumeric"
+                )
+
+        invoices = self.filtered(
+            lambda inv: inv.l10n_do_fiscal_number and inv not in errors
         )
-        if safe_eval(response_text).get("valid", False):
-            return True
+        if not invoices:
+            return errors
 
-        return False
+        # Duplicated NCF of the same partner within a company, both among
+        # posted invoices and inside the batch itself
+        seen = defaultdict(list)
+        for invoice in invoices:
+            seen[
+                (
+                    invoice.company_id.id,
+                    invoice.commercial_partner_id.id,
+                    invoice.l10n_do_fiscal_number,
+                )
+            ].append(invoice)
+        self.flush(
+            ["company_id", "commercial_partner_id", "l10n_do_fiscal_number", "state"]
+        )
+        self.env.cr.execute(
+            """
+            SELECT company_id, commercial_partner_id, l10n_do_fiscal_number, name
+            FROM account_move
+            WHERE l10n_do_fiscal_number IN %s
+            AND company_id IN %s
+            AND state = 'posted'
+            AND id NOT IN %s
+            """,
+            (
+                tuple(set(invoices.mapped("l10n_do_fiscal_number"))),
+                tuple(invoices.company_id.ids),
+                tuple(invoices.ids),
+            ),
+        )
+        posted = {row[:3]: row[3] for row in self.env.cr.fetchall()}
+        for key, batch_invoices in seen.items():
+            if key not in posted and len(batch_invoices) < 2:
+                continue
+            for invoice in batch_invoices:
+                duplicate = posted.get(key) or ", ".join(
+                    other.display_name for other in batch_invoices if other != invoice
+                )
+                errors[invoice] = _("NCF %s is already used by %s.") % (
+                    invoice.l10n_do_fiscal_number,
+                    duplicate,
+                )
+        return errors
+
+    def _get_ncf_validation_errors(self):
+        """
+        Validate the NCF of every invoice in self, querying the external
+        service concurrently for the whole batch. Invoices failing local
+        rules are not sent.
+
+        :return: dict: {invoice: error message} of the invoices that failed
+        """
+        errors, payloads = self._get_ncf_local_errors(), {}
+        for invoice in self.filtered(lambda inv: inv not in errors):
+            try:
+                payloads[invoice] = invoice._get_ncf_validation_payload()
+            except ValidationError as e:
+                errors[invoice] = e.args[0]
+
+        results = self._query_ncf_validation(list(payloads.values()))
+        for invoice, is_valid in zip(payloads, results):
+            if not is_valid:
+                errors[invoice] = _(
+                    "Cannot validate Fiscal Invoice because %s is not a valid NCF"
+                ) % (invoice.l10n_do_fiscal_number)
+
+        return errors
 
     def action_post(self):
 
@@ -97,6 +352,7 @@ class AccountMove(models.Model):
 
         result = super(AccountMove, self).action_post()
 
+        to_validate = self.browse()
         for invoice in l10n_do_fiscal_invoice:
             ncf_validation_target = invoice.company_id.ncf_validation_target
             if ncf_validation_target != "both":
@@ -112,12 +368,176 @@ class AccountMove(models.Model):
                 ):
                     continue
 
-            if not invoice._has_valid_ncf():
-                raise ValidationError(
-                    _(
-                        "Cannot validate Fiscal Invoice "
-                        "because %s is not a valid NCF" % invoice.l10n_do_fiscal_number
-                    )
-                )
+            to_validate |= invoice
+
+        deferred = to_validate.filtered(
+            lambda inv: inv.company_id.ncf_validation_mode == "deferred"
+        )
+        if deferred:
+            deferred._enqueue_ncf_validation()
+            to_validate -= deferred
 
+        if not to_validate:
+            return result
+
+        errors = to_validate._get_ncf_validation_errors()
+        if errors:
+            raise ValidationError(
+                "\n".join(errors[inv] for inv in to_validate if inv in errors)
+            )
+        to_validate.write({"ncf_validation_state": "valid"})
+
+        return result
+
+    def _clear_ncf_validation(self):
+        self.filtered("ncf_validation_state").write(
+            {
+                "ncf_validation_state": False,
+                "ncf_validation_attempts": 0,
+                "ncf_validation_next_try": False,
+                "ncf_validation_message": False,
+            }
+        )
+
+    def button_draft(self):
+        # A reset invoice is validated again when reposted
+        result = super(AccountMove, self).button_draft()
+        self._clear_ncf_validation()
         return result
+
+    def button_cancel(self):
+        result = super(AccountMove, self).button_cancel()
+        self._clear_ncf_validation()
+        return result
+
+    def action_prewarm_ncf_validation(self):
+        """
+        Validate the NCF of the selected invoices ahead of time, so
+        reposting them is served from the validation results store.
+        Invoices whose NCF has an invalid format are ignored.
+        """
+        payloads = []
+        for invoice in self.filtered("l10n_do_fiscal_number"):
+            try:
+                payloads.append(invoice._get_ncf_validation_payload())
+            except ValidationError:
+                continue
+        self.env["l10n_do.ncf.validation.result"].with_context(
+            l10n_do_service_priority="bulk"
+        ).prewarm(payloads)
+
+    def _enqueue_ncf_validation(self):
+        self.write(
+            {
+                "ncf_validation_state": "pending",
+                "ncf_validation_attempts": 0,
+                "ncf_validation_next_try": fields.Datetime.now(),
+                "ncf_validation_message": False,
+            }
+        )
+        self.env.ref("l10n_do_ncf_validation.ir_cron_ncf_validation_queue")._trigger()
+
+    def _notify_ncf_validation_issue(self):
+        for invoice in self:
+            invoice.activity_schedule(
+                "mail.mail_activity_data_warning",
+                summary=_("NCF validation failed"),
+                note=invoice.ncf_validation_message,
+                user_id=(invoice.invoice_user_id or invoice.create_uid).id,
+            )
+
+    def _process_ncf_validation_queue(self):
+        """
+        Validate a batch of deferred invoices. Invalid NCF and invoices
+        that ran out of attempts get a warning activity, service errors are
+        retried with exponential backoff.
+        """
+        max_attempts = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("ncf.api.max_attempts", 5)
+        )
+        now = fields.Datetime.now()
+        payloads = {}
+        local_errors = self._get_ncf_local_errors()
+        for invoice, message in local_errors.items():
+            invoice.write(
+                {"ncf_validation_state": "invalid", "ncf_validation_message": message}
+            )
+            invoice._notify_ncf_validation_issue()
+
+        for invoice in self.filtered(lambda inv: inv not in local_errors):
+            try:
+                payloads[invoice] = invoice._get_ncf_validation_payload()
+            except ValidationError as e:
+                invoice.write(
+                    {
+                        "ncf_validation_state": "invalid",
+                        "ncf_validation_message": e.args[0],
+                    }
+                )
+                invoice._notify_ncf_validation_issue()
+
+        statuses = self._request_ncf_statuses(list(payloads.values()))
+        for invoice, status in zip(payloads, statuses):
+            if status == "valid":
+                invoice.write(
+                    {"ncf_validation_state": "valid", "ncf_validation_message": False}
+                )
+            elif status == "invalid":
+                invoice.write(
+                    {
+                        "ncf_validation_state": "invalid",
+                        "ncf_validation_message": _("%s is not a valid NCF")
+                        % invoice.l10n_do_fiscal_number,
+                    }
+                )
+                invoice._notify_ncf_validation_issue()
+            else:
+                attempts = invoice.ncf_validation_attempts + 1
+                message = (
+                    _("Odoo couldn't authenticate with external service.")
+                    if status == "forbidden"
+                    else _("Could not establish communication with external service.")
+                )
+                invoice.write(
+                    {
+                        "ncf_validation_state": "error"
+                        if attempts >= max_attempts
+                        else "pending",
+                        "ncf_validation_attempts": attempts,
+                        "ncf_validation_next_try": now
+                        + timedelta(minutes=2 ** attempts),
+                        "ncf_validation_message": message,
+                    }
+                )
+                if attempts >= max_attempts:
+                    invoice._notify_ncf_validation_issue()
+
+    @api.model
+    def _cron_validate_pending_ncf(self):
+        """
+        Drain the deferred NCF validation queue in batches, committing
+        after each one.
+        """
+        moves = self.with_context(l10n_do_service_priority="bulk")
+        while True:
+            invoices = moves.search(
+                [
+                    ("state", "=", "posted"),
+                    ("ncf_validation_state", "=", "pending"),
+                    ("ncf_validation_next_try", "<=", fields.Datetime.now()),
+                ],
+                order="ncf_validation_next_try",
+                limit=NCF_QUEUE_BATCH_SIZE,
+            )
+            if not invoices:
+                break
+            invoices._process_ncf_validation_queue()
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            _logger.info("Processed %s deferred NCF validations", len(invoices))
+
+    def action_retry_ncf_validation(self):
+        self.filtered(
+            lambda inv: inv.ncf_validation_state in ("invalid", "error")
+        )._enqueue_ncf_validation()
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+
+class NcfValidationResult(models.Model):
+    _name = "l10n_do.ncf.validation.result"
+    _description = "NCF Validation Result"
+    _rec_name = "ncf"
+    _order = "checked_on desc"
+
+    ncf = fields.Char("NCF", required=True, readonly=True)
+    rnc = fields.Char("RNC", required=True, readonly=True)
+    buyer_rnc = fields.Char("Buyer RNC", readonly=True)
+    security_code = fields.Char(readonly=True)
+    checked_on = fields.Datetime(required=True, index=True, readonly=True)
+
+    _sql_constraints = [
+        (
+            "payload_uniq",
+            "unique(ncf, rnc, buyer_rnc, security_code)",
+            "A NCF validation can only be stored once.",
+        ),
+    ]
+
+    @api.model
+    def _get_key(self, payload):
+        return (
+            payload["ncf"],
+            payload["rnc"],
+            payload.get("buyerRNC") or "",
+            payload.get("securityCode") or "",
+        )
+
+    @api.model
+    def _get_expiration_limit(self):
+        days = (
+            self.env["ir.config_parameter"].sudo().get_param("ncf.api.cache.ttl", 30)
+        )
+        return fields.Datetime.now() - timedelta(days=float(days))
+
+    @api.model
+    def _get_valid(self, payloads):
+        """
+        :param payloads: list of dicts as returned by _get_ncf_validation_payload
+        :return: set of keys of the payloads already confirmed valid
+        """
+        keys = tuple({self._get_key(payload) for payload in payloads})
+        if not keys:
+            return set()
+        self.env.cr.execute(
+            """
+            SELECT ncf, rnc, buyer_rnc, security_code
+            FROM l10n_do_ncf_validation_result
+            WHERE (ncf, rnc, buyer_rnc, security_code) IN %s
+            AND checked_on >= %s
+            """,
+            (keys, self._get_expiration_limit()),
+        )
+        valid = set(self.env.cr.fetchall())
+        self.env["l10n_do.external.service"]._record_cache_lookups(
+            "ncf", hits=len(valid), misses=len(keys) - len(valid)
+        )
+        return valid
+
+    @api.model
+    def _store_valid(self, payloads):
+        """Remember the given payloads as valid NCF."""
+        now = fields.Datetime.now()
+        for key in {self._get_key(payload) for payload in payloads}:
+            self.env.cr.execute(
+                """
+                INSERT INTO l10n_do_ncf_validation_result (
+                    ncf, rnc, buyer_rnc, security_code, checked_on,
+                    create_uid, create_date, write_uid, write_date
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (ncf, rnc, buyer_rnc, security_code) DO UPDATE
+                SET checked_on = EXCLUDED.checked_on,
+                    write_uid = EXCLUDED.write_uid,
+                    write_date = EXCLUDED.write_date
+                """,
+                key + (now, self.env.uid, now, self.env.uid, now),
+            )
+
+    @api.model
+    def prewarm(self, payloads):
+        """
+        Validate a list of NCF payloads ahead of time, so posting or
+        reposting the invoices using them doesn't query the external service.
+
+        :param payloads: list of dicts with ncf, rnc and, for ECF, buyerRNC
+        and securityCode keys
+        :return: list of booleans, True if valid NCF, in the same order
+        """
+        return [
+            status == "valid"
+            for status in self.env["account.move"]._request_ncf_statuses(payloads)
+        ]
+
+    @api.autovacuum
+    def _gc_expired_results(self):
+        self.env.cr.execute(
+            "DELETE FROM l10n_do_ncf_validation_result WHERE checked_on < %s",
+            (self._get_expiration_limit(),),
+        )
@@ -17,3 +17,10 @@ class ResCompany(models.Model):
         "-Both: validates both cases.",
     )
     validate_ecf = fields.Boolean()
+    ncf_validation_mode = fields.Selection(
+        [("sync", "On Posting"), ("deferred", "Deferred")],
+        default="sync",
+        help="-On Posting: invoices with an invalid NCF can't be posted.\n"
+        "-Deferred: invoices are posted and their NCF validated in background. "
+        "Invalid NCF raise an activity on the invoice.",
+    )
@@ -10,3 +10,8 @@ class ResConfigSettings(models.TransientModel):
         required=True,
     )
     validate_ecf = fields.Boolean(related="company_id.validate_ecf", readonly=False)
+    ncf_validation_mode = fields.Selection(
+        related="company_id.ncf_validation_mode",
+        readonly=False,
+        required=True,
+    )
@@ -0,0 +1,3 @@
+from . import test_benchmark
+from . import test_ncf_local_rules
+from . import test_ncf_validation_queue
@@ -0,0 +1,37 @@
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.l10n_do_external_service.tests.common import MockServiceCase
+
+
+@tagged("post_install", "-at_install", "-standard", "benchmark")
+class NcfValidationBenchmark(MockServiceCase, TransactionCase):
+    mock_latency = 0.02
+
+    def _get_payloads(self, count):
+        return [{"ncf": "B01%08d" % i, "rnc": "131793916"} for i in range(count)]
+
+    def test_001_batch_posting_validation(self):
+        Move = self.env["account.move"]
+        payloads = self._get_payloads(200)
+        with self.benchmark("NCF batch validation", len(payloads)) as stats:
+            result = Move._query_ncf_validation(payloads)
+
+        self.assertTrue(all(result))
+        self.assertEqual(stats["http_calls"].get("ncf"), len(payloads))
+
+        # Reposting is served from the validation results store
+        with self.benchmark("NCF batch revalidation", len(payloads)) as stats:
+            Move._query_ncf_validation(payloads)
+        self.assertFalse(stats["http_calls"])
+
+    def test_002_batch_validation_with_errors(self):
+        self.mock_server.error_rate = 0.2
+        payloads = self._get_payloads(100)
+        try:
+            with self.benchmark("NCF batch validation, 20% errors", len(payloads)):
+                statuses = self.env["account.move"]._request_ncf_statuses(payloads)
+        finally:
+            self.mock_server.error_rate = 0.0
+
+        self.assertEqual(len(statuses), len(payloads))
+        self.assertTrue(set(statuses) <= {"valid", "connection_error"})
@@ -0,0 +1,63 @@
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+@tagged("post_install", "-at_install")
+class NcfLocalRulesTest(AccountTestInvoicingCommon):
+    def _create_invoice(self, move_type, ncf, partner=None, post=False):
+        invoice = self.init_invoice(move_type, partner=partner, products=self.product_a)
+        invoice.l10n_do_fiscal_number = ncf
+        if post:
+            invoice.action_post()
+        return invoice
+
+    def test_001_ncf_format(self):
+        valid = self._create_invoice("out_invoice", "B0100000001")
+        invalid = self._create_invoice("out_invoice", "B9900000001")
+        errors = (valid | invalid)._get_ncf_local_errors()
+        self.assertNotIn(valid, errors)
+        self.assertIn("invalid format", errors[invalid])
+
+    def test_002_document_type(self):
+        invoices = {
+            ("out_invoice", "B0100000001"): True,
+            ("out_invoice", "B0300000001"): True,
+            ("out_invoice", "B0400000001"): False,
+            ("out_invoice", "B1100000001"): False,
+            ("out_invoice", "B1300000001"): False,
+            ("out_invoice", "E410000000001"): False,
+            ("out_refund", "B0400000002"): True,
+            ("out_refund", "B0100000002"): False,
+            ("in_invoice", "B1100000003"): True,
+            ("in_invoice", "B0100000003"): True,
+            ("in_invoice", "B1600000003"): False,
+            ("in_refund", "E340000000003"): True,
+        }
+        moves = {
+            key: self._create_invoice(*key, partner=self.partner_b) for key in invoices
+        }
+        records = self.env["account.move"].union(*moves.values())
+        errors = records._get_ncf_local_errors()
+        for key, valid in invoices.items():
+            self.assertEqual(moves[key] not in errors, valid, key)
+
+    def test_003_duplicated_ncf(self):
+        posted = self._create_invoice("out_invoice", "B0100000010", post=True)
+        duplicate = self._create_invoice("out_invoice", "B0100000010")
+        other_partner = self._create_invoice(
+            "out_invoice", "B0100000010", partner=self.partner_b
+        )
+        batch = self._create_invoice("out_invoice", "B0100000011")
+        batch |= self._create_invoice("out_invoice", "B0100000011")
+        unique = self._create_invoice("out_invoice", "B0100000012")
+
+        invoices = duplicate | other_partner | batch | unique
+        invoices._get_ncf_local_errors()
+        # Once fields are cached, posted duplicates are looked up at once
+        with self.assertQueryCount(1):
+            errors = invoices._get_ncf_local_errors()
+        self.assertIn(posted.name, errors[duplicate])
+        # Batch duplicates name the other invoices, not themselves
+        self.assertIn(batch[1].display_name, errors[batch[0]])
+        self.assertNotIn(batch[0].display_name, errors[batch[0]])
+        self.assertEqual(set(errors), set(duplicate | batch))
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+from odoo.addons.l10n_do_external_service.tests.common import MockServiceCase
+
+
+@tagged("post_install", "-at_install")
+class NcfValidationQueueTest(MockServiceCase, AccountTestInvoicingCommon):
+    @classmethod
+    def setUpClass(cls):
+        super(NcfValidationQueueTest, cls).setUpClass()
+        cls.env.company.vat = "131793916"
+        cls.env["ir.config_parameter"].sudo().set_param("ncf.api.max_attempts", 3)
+
+    def _create_pending_invoice(self, ncf):
+        invoice = self.init_invoice("out_invoice", products=self.product_a)
+        invoice.l10n_do_fiscal_number = ncf
+        invoice.action_post()
+        invoice._enqueue_ncf_validation()
+        return invoice
+
+    def _set_ncf_route(self, route):
+        routes = self.mock_server.routes
+        self.addCleanup(routes.__setitem__, "ncf", routes["ncf"])
+        routes["ncf"] = route
+
+    def _warnings(self, invoice):
+        return invoice.activity_ids.filtered(
+            lambda a: a.activity_type_id
+            == self.env.ref("mail.mail_activity_data_warning")
+        )
+
+    def test_001_valid_and_invalid(self):
+        self._set_ncf_route(
+            lambda params: (200, {"valid": params["ncf"] != "B0100000002"})
+        )
+        valid = self._create_pending_invoice("B0100000001")
+        invalid = self._create_pending_invoice("B0100000002")
+        wrong_format = self._create_pending_invoice("B9900000003")
+        self.assertEqual(valid.ncf_validation_state, "pending")
+
+        (valid | invalid | wrong_format)._process_ncf_validation_queue()
+
+        self.assertEqual(valid.ncf_validation_state, "valid")
+        self.assertFalse(self._warnings(valid))
+        for invoice in invalid | wrong_format:
+            self.assertEqual(invoice.ncf_validation_state, "invalid")
+            self.assertTrue(invoice.ncf_validation_message)
+            self.assertEqual(len(self._warnings(invoice)), 1)
+
+    def test_002_error_backoff_and_max_attempts(self):
+        self._set_ncf_route(lambda params: (403, {"status": "error"}))
+        invoice = self._create_pending_invoice("B0100000004")
+
+        before = fields.Datetime.now()
+        invoice._process_ncf_validation_queue()
+        self.assertEqual(invoice.ncf_validation_state, "pending")
+        self.assertEqual(invoice.ncf_validation_attempts, 1)
+        self.assertGreaterEqual(
+            invoice.ncf_validation_next_try, before + timedelta(minutes=2)
+        )
+        self.assertFalse(self._warnings(invoice))
+
+        # Backoff doubles with every attempt
+        before = fields.Datetime.now()
+        invoice._process_ncf_validation_queue()
+        self.assertEqual(invoice.ncf_validation_state, "pending")
+        self.assertEqual(invoice.ncf_validation_attempts, 2)
+        self.assertGreaterEqual(
+            invoice.ncf_validation_next_try, before + timedelta(minutes=4)
+        )
+
+        # ncf.api.max_attempts reached
+        invoice._process_ncf_validation_queue()
+        self.assertEqual(invoice.ncf_validation_state, "error")
+        self.assertEqual(invoice.ncf_validation_attempts, 3)
+        self.assertEqual(len(self._warnings(invoice)), 1)
+
+    def test_003_retry(self):
+        self._set_ncf_route(lambda params: (403, {"status": "error"}))
+        invoice = self._create_pending_invoice("B0100000005")
+        invoice.ncf_validation_attempts = 2
+        invoice._process_ncf_validation_queue()
+        self.assertEqual(invoice.ncf_validation_state, "error")
+
+        invoice.action_retry_ncf_validation()
+        self.assertEqual(invoice.ncf_validation_state, "pending")
+        self.assertEqual(invoice.ncf_validation_attempts, 0)
+
+    def test_004_reset_invoices_leave_the_queue(self):
+        self._set_ncf_route(lambda params: (200, {"valid": False}))
+        pending = self._create_pending_invoice("B0100000006")
+        draft = self._create_pending_invoice("B0100000007")
+        cancelled = self._create_pending_invoice("B0100000008")
+        draft.button_draft()
+        cancelled.button_draft()
+        cancelled.button_cancel()
+        for invoice in draft | cancelled:
+            self.assertFalse(invoice.ncf_validation_state)
+
+        # A draft invoice left in the queue isn't validated either
+        draft.ncf_validation_state = "pending"
+        with patch.object(type(self.env.cr), "commit"):
+            self.env["account.move"]._cron_validate_pending_ncf()
+        self.assertEqual(pending.ncf_validation_state, "invalid")
+        self.assertEqual(draft.ncf_validation_state, "pending")
+        self.assertFalse(self._warnings(draft | cancelled))
@@ -1,6 +1,6 @@
 {
     "name": "Dominican Tax ID Validation",
-    "version": "15.0.1.0.0",
+    "version": "15.0.1.7.0",
     "summary": "Validate RNC/Cédula from external service",
     "category": "Extra Tools",
     "author": "Guavana," "Indexa," "Iterativo",
@@ -9,11 +9,20 @@
     "depends": [
         "base",
         "base_setup",
+        "l10n_do_external_service",
     ],
     "data": [
+        "security/ir.model.access.csv",
         "views/res_partner_views.xml",
         "views/res_config_settings_views.xml",
+        "wizard/vat_duplicate_audit_views.xml",
         "data/ir_config_parameter_data.xml",
+        "data/ir_cron_data.xml",
     ],
+    "assets": {
+        "web.assets_backend": [
+            "l10n_do_rnc_validation/static/src/js/vat_field.js",
+        ],
+    },
     "installable": True,
 }
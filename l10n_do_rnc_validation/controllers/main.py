@@ -0,0 +1,16 @@
+from odoo import http
+from odoo.http import request
+
+
+class RncValidation(http.Controller):
+    @http.route("/l10n_do_rnc_validation/contact_data", type="json", auth="user")
+    def contact_data(self, vat, partner_id=None):
+        """
+        Fiscal data of a RNC/Cédula, requested by the partner form as the
+        user types it. The lookup warms the cache, so saving the form
+        afterwards doesn't wait for the external service.
+        """
+        Partner = request.env["res.partner"]
+        if partner_id:
+            Partner = Partner.browse(int(partner_id)).exists()
+        return Partner.l10n_do_get_fiscal_data(vat)
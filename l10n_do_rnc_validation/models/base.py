@@ -0,0 +1,28 @@
+from odoo import models
+
+
+class Base(models.AbstractModel):
+    _inherit = "base"
+
+    def load(self, fields, data):
+        """
+        Resolve the RNC/Cédula found in contact columns of the imported
+        rows at once, before they are converted row by row.
+        """
+        columns = []
+        for index, path in enumerate(fields):
+            field = self._fields.get(path)
+            if field and field.type == "many2one":
+                if field.comodel_name == "res.partner":
+                    columns.append(index)
+        if columns and data:
+            vats = {
+                str(row[index]).strip()
+                for row in data
+                for index in columns
+                if index < len(row) and row[index]
+            }
+            vats = [vat for vat in vats if vat.isdigit() and len(vat) in (9, 11)]
+            if vats:
+                self.env["res.partner"]._l10n_do_prefetch_vat_partners(vats)
+        return super(Base, self).load(fields, data)
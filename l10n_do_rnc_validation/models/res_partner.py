@@ -1,9 +1,17 @@
-import json
 import logging
+import re
+import time
+import weakref
+import psycopg2
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-from odoo import models, api, _
+from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools.sql import column_exists, create_column, index_exists
+
+from odoo.addons.l10n_do_external_service.tools import decoders
 
 _logger = logging.getLogger(__name__)
 
@@ -12,28 +20,136 @@ try:
 except (ImportError, IOError) as err:
     _logger.debug(err)
 
+# {cursor: {(uid, company_id, vat): partner id}} of the RNC/Cédula resolved
+# by name_create/name_search in the cursor current transaction
+_vat_memo = weakref.WeakKeyDictionary()
+
+# Digits a name_search needs to be looked up as a partial RNC/Cédula
+VAT_SEARCH_MIN_DIGITS = 5
+
+
+def _request_contact_data(client, api_url, token, vat):
+    """
+    Request contact fiscal data of a RNC/Cédula from external service.
+
+    :return: tuple (data, cacheable), cacheable is False when the service
+    couldn't be reached or answered an error
+    """
+    _logger.info("Starting contact fiscal data request of res.partner vat: %s" % vat)
+    try:
+        response = client.get(api_url, {"rnc": vat}, headers={"x-access-token": token})
+    except requests.exceptions.RequestException as e:
+        _logger.warning("API requests return the following error %s" % e)
+        return {"status": "error", "data": []}, False
+    try:
+        contact = decoders.decode_contact(response.content)
+    except decoders.DecodeError as e:
+        _logger.warning(e)
+        return None, False
+    return dict(contact._asdict()), response.ok
+
+
+def _request_dgii_data(vat, timeout=30):
+    """
+    Scrape contact data from DGII. Thread safe.
+
+    :return: tuple (data, cacheable)
+    """
+    try:
+        return rnc.check_dgii(vat, timeout=timeout), True
+    except Exception:
+        return False, False
+
 
 class ResPartner(models.Model):
     _inherit = "res.partner"
 
+    l10n_do_vat_digits = fields.Char(
+        "Tax ID Digits",
+        compute="_compute_l10n_do_vat_digits",
+        store=True,
+        index=True,
+        help="Tax ID without separators, used to search contacts by RNC/Cédula.",
+    )
+    l10n_do_fiscal_state = fields.Char(
+        "DGII Status",
+        readonly=True,
+        copy=False,
+        help="Contributor status at DGII, Eg: ACTIVO, SUSPENDIDO.",
+    )
+    l10n_do_payment_regime = fields.Char(
+        "Payment Regime", readonly=True, copy=False
+    )
+    l10n_do_fiscal_checked_on = fields.Datetime(
+        "Fiscal Status Checked On", readonly=True, copy=False, index=True
+    )
+
+    def _auto_init(self):
+        # Fill the column in SQL instead of computing it for every partner
+        if not column_exists(self.env.cr, "res_partner", "l10n_do_vat_digits"):
+            create_column(self.env.cr, "res_partner", "l10n_do_vat_digits", "varchar")
+            self.env.cr.execute(
+                """
+                UPDATE res_partner
+                SET l10n_do_vat_digits =
+                    NULLIF(regexp_replace(vat, '[^0-9]', '', 'g'), '')
+                WHERE vat IS NOT NULL
+                """
+            )
+        return super(ResPartner, self)._auto_init()
+
+    def init(self):
+        super(ResPartner, self).init()
+        index_name = "res_partner_l10n_do_vat_digits_trgm_index"
+        if index_exists(self.env.cr, index_name):
+            return
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                self.env.cr.execute(
+                    "CREATE INDEX %s ON res_partner "
+                    "USING gin (l10n_do_vat_digits gin_trgm_ops)" % index_name
+                )
+        except psycopg2.Error as e:
+            _logger.warning(
+                "Unable to create trigram index on res_partner RNC/Cédula, "
+                "partial searches won't use an index: %s",
+                e,
+            )
+
+    @api.depends("vat")
+    def _compute_l10n_do_vat_digits(self):
+        for partner in self:
+            vat_digits = re.sub(r"[^0-9]", "", partner.vat or "")
+            partner.l10n_do_vat_digits = vat_digits or False
+
     @api.model
     def name_search(self, name, args=None, operator="ilike", limit=100):
         res = super(ResPartner, self).name_search(
             name, args=args, operator=operator, limit=100
         )
-        if not res and name:
-            if len(name) in (9, 11):
-                partners = self.search([("vat", "=", name)])
-            else:
-                partners = self.search([("vat", "ilike", name)])
-            if partners:
-                res = partners.name_get()
+        # Only searches made of digits and separators are taken as a RNC/Cédula
+        if not res and name and re.fullmatch(r"[\d\s-]+", name):
+            vat_digits = re.sub(r"[^0-9]", "", name)
+            memo_key = self._l10n_do_vat_memo_key(vat_digits)
+            partner_id = self._l10n_do_vat_memo().get(memo_key)
+            if partner_id and not args:
+                return self.browse(partner_id).name_get()
+            if len(vat_digits) >= VAT_SEARCH_MIN_DIGITS:
+                vat_operator = "=" if len(vat_digits) in (9, 11) else "ilike"
+                partners = self.search(
+                    [("l10n_do_vat_digits", vat_operator, vat_digits)] + (args or []),
+                    limit=limit,
+                )
+                if partners:
+                    res = partners.name_get()
         return res
 
     @api.model
     def get_contact_data(self, vat):
         """
-        Gets contact fiscal data from external service.
+        Gets contact fiscal data from the lookup cache, the local DGII
+        registry or, when missing from both, the external service.
 
         :param vat: string representation of contact tax id
         :return: json object containing contact fiscal data
@@ -58,32 +174,130 @@ class ResPartner(models.Model):
         }
         """
         if vat and vat.isdigit():
-            try:
-                _logger.info(
-                    "Starting contact fiscal data request "
-                    "of res.partner vat: %s" % vat
-                )
-                api_url = (
-                    self.env["ir.config_parameter"]
-                    .sudo()
-                    .get_param("rnc.indexa.api.url")
-                )
-                token = (
-                    self.env["ir.config_parameter"]
-                    .sudo()
-                    .get_param("rnc.indexa.api.token")
+            RncCache = self.env["l10n_do.rnc.cache"].sudo()
+            hit, data = RncCache._lookup(vat)
+            if hit:
+                return data
+            data = self.env["l10n_do.rnc.registry"].sudo()._lookup(vat)
+            if data:
+                return data
+            get_param = self.env["ir.config_parameter"].sudo().get_param
+            data, cacheable = _request_contact_data(
+                self.env["l10n_do.external.service"]._get_http_client("rnc"),
+                get_param("rnc.indexa.api.url"),
+                get_param("rnc.indexa.api.token"),
+                vat,
+            )
+            if cacheable:
+                RncCache._store(vat, data)
+            return data
+        return False
+
+    @api.model
+    def _prefetch_contact_data(self, vats):
+        """
+        Fetch fiscal data of several RNC/Cédula concurrently and keep it in
+        the lookup cache, so later get_contact_data() calls don't hit the
+        network. Numbers found in the local DGII registry are skipped and
+        numbers unknown by the external service are looked up on DGII the
+        same way.
+
+        :param vats: list of RNC/Cédula
+        :return: dict {vat: (data, dgii_data)} of the numbers whose lookup
+        succeeded, data being shaped like get_contact_data() response and
+        dgii_data the DGII data of the numbers the service doesn't know.
+        Numbers whose lookup failed are left out.
+        """
+        RncCache = self.env["l10n_do.rnc.cache"].sudo()
+        client = self.env["l10n_do.external.service"]._get_http_client("rnc")
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        api_url = get_param("rnc.indexa.api.url")
+        token = get_param("rnc.indexa.api.token")
+        max_workers = int(get_param("rnc.indexa.api.workers", 8))
+
+        contact_data = {
+            vat: RncCache._lookup(vat) for vat in set(vats) if vat and vat.isdigit()
+        }
+        missing = [vat for vat, (hit, data) in contact_data.items() if not hit]
+        registry = self.env["l10n_do.rnc.registry"].sudo()._lookup_many(missing)
+        for vat, data in registry.items():
+            contact_data[vat] = (True, data)
+        missing = [vat for vat in missing if vat not in registry]
+        if missing:
+            with ThreadPoolExecutor(min(max_workers, len(missing))) as executor:
+                responses = executor.map(
+                    lambda vat: _request_contact_data(client, api_url, token, vat),
+                    missing,
                 )
-                response = requests.get(
-                    api_url, {"rnc": vat}, headers={"x-access-token": token}
+                for vat, (data, cacheable) in zip(missing, responses):
+                    contact_data[vat] = (cacheable, data)
+                    if cacheable:
+                        RncCache._store(vat, data)
+
+        dgii_data = {}
+        missing = []
+        for vat, (hit, data) in contact_data.items():
+            if (data or {}).get("data"):
+                continue
+            dgii_hit, dgii_vals = RncCache._lookup(vat, source="dgii")
+            if dgii_hit:
+                dgii_data[vat] = dgii_vals
+            else:
+                missing.append(vat)
+        if missing:
+            with ThreadPoolExecutor(min(max_workers, len(missing))) as executor:
+                responses = executor.map(
+                    lambda vat: _request_dgii_data(vat, client.timeout[1]), missing
                 )
-            except requests.exceptions.ConnectionError as e:
-                _logger.warning("API requests return the following " "error %s" % e)
-                return {"status": "error", "data": []}
-            try:
-                return json.loads(response.text)
-            except TypeError:
-                _logger.warning(_("No serializable data from API response"))
-        return False
+                for vat, (data, cacheable) in zip(missing, responses):
+                    if cacheable:
+                        RncCache._store(vat, data, source="dgii")
+                        dgii_data[vat] = data
+
+        # Not found is only definitive when both sources answered
+        return {
+            vat: (data, dgii_data.get(vat))
+            for vat, (hit, data) in contact_data.items()
+            if (data or {}).get("data")
+            or dgii_data.get(vat)
+            or (hit and vat in dgii_data)
+        }
+
+    def _check_rnc_cedula_duplicates(self, numbers):
+        """
+        Raise if any of the given RNC/Cédula is already assigned to
+        another contact. All numbers are checked in a single query.
+        """
+        company_id = self.env.user.company_id
+        if self.env.context.get("model") == "res.partner" and self:
+            self_id = [self.id, self.parent_id.id]
+        else:
+            self_id = [company_id.id]
+
+        # Considering multi-company scenarios
+        domain = [
+            ("l10n_do_vat_digits", "in", list(set(numbers))),
+            ("id", "not in", self_id),
+            ("parent_id", "=", False),
+        ]
+        if self.sudo().env.ref("base.res_partner_rule").active:
+            domain.extend([("company_id", "=", company_id.id)])
+        contacts = self.search(domain)
+        if not contacts:
+            return
+
+        errors = []
+        for number in sorted(set(contacts.mapped("l10n_do_vat_digits"))):
+            contact = contacts.filtered(lambda c: c.l10n_do_vat_digits == number)
+            name = (
+                contact.name
+                if len(contact) == 1
+                else ", ".join([x.name for x in contact if x.name])
+            )
+            errors.append(
+                _("RNC/Cédula %s is already assigned to %s") % (number, name)
+            )
+        raise UserError("\n".join(errors))
 
     @api.model
     def validate_rnc_cedula(self, number):
@@ -99,30 +313,8 @@ class ResPartner(models.Model):
             result, dgii_vals = {}, False
             model = self.env.context.get("model")
 
-            if model == "res.partner" and self:
-                self_id = [self.id, self.parent_id.id]
-            else:
-                self_id = [company_id.id]
-
-            # Considering multi-company scenarios
-            domain = [
-                ("vat", "=", number),
-                ("id", "not in", self_id),
-                ("parent_id", "=", False),
-            ]
-            if self.sudo().env.ref("base.res_partner_rule").active:
-                domain.extend([("company_id", "=", company_id.id)])
-            contact = self.search(domain)
-
-            if contact:
-                name = (
-                    contact.name
-                    if len(contact) == 1
-                    else ", ".join([x.name for x in contact if x.name])
-                )
-                raise UserError(
-                    _("RNC/Cédula %s is already assigned to %s") % (number, name)
-                )
+            if not self.env.context.get("l10n_do_rnc_duplicates_checked"):
+                self._check_rnc_cedula_duplicates([number])
 
             is_rnc = len(number) == 9
             try:
@@ -136,6 +328,8 @@ class ResPartner(models.Model):
                 result["name"] = data["business_name"]
                 result["ref"] = data.get("tradename")
                 result["vat"] = number
+                result["l10n_do_fiscal_state"] = data.get("state")
+                result["l10n_do_payment_regime"] = data.get("payment_regime")
                 if not result.get("phone") and data.get("phone"):
                     result["phone"] = data["phone"]
                 if not result.get("street"):
@@ -155,23 +349,55 @@ class ResPartner(models.Model):
                     result["is_company"] = True if is_rnc else False
 
             else:
-                try:
-                    dgii_vals = rnc.check_dgii(number)
-                except Exception:
-                    pass
+                RncCache = self.env["l10n_do.rnc.cache"].sudo()
+                hit, dgii_vals = RncCache._lookup(number, source="dgii")
+                if not hit:
+                    timeout = (
+                        self.env["l10n_do.external.service"]
+                        ._get_http_client("rnc")
+                        .timeout[1]
+                    )
+                    dgii_vals, cacheable = _request_dgii_data(number, timeout)
+                    if cacheable:
+                        RncCache._store(number, dgii_vals, source="dgii")
                 if not bool(dgii_vals):
                     result["vat"] = number
                 else:
                     result["name"] = dgii_vals.get("name", False)
                     result["vat"] = dgii_vals.get("rnc")
+                    result["l10n_do_fiscal_state"] = dgii_vals.get("status")
+                    result["l10n_do_payment_regime"] = dgii_vals.get("payment_regime")
                     if model == "res.partner":
                         result["is_company"] = is_rnc
             return result
 
+    def l10n_do_get_fiscal_data(self, vat):
+        """
+        Look a RNC/Cédula up the same way partner creation does, without
+        raising when it is already assigned to another contact.
+
+        :param vat: RNC/Cédula, separators are ignored
+        :return: dict with the values to fill the partner with (name, ref,
+        vat, phone, street, is_company) and a warning message, if any
+        """
+        number = re.sub(r"[^0-9]", "", vat or "")
+        if len(number) not in (9, 11):
+            return {}
+        partner = self[:1].with_context(model=self._name)
+        try:
+            values = partner.validate_rnc_cedula(number)
+        except UserError as e:
+            return {"warning": e.args[0]}
+        return {"values": values or {}}
+
+    @api.model
+    def _get_vals_vat(self, vals):
+        return vals["vat"] if vals.get("vat") else vals.get("name")
+
     def _get_updated_vals(self, vals):
         new_vals = {}
         if any([val in vals for val in ["name", "vat"]]):
-            vat = vals["vat"] if vals.get("vat") else vals.get("name")
+            vat = self._get_vals_vat(vals)
             result = self.with_context(model=self._name).validate_rnc_cedula(vat)
             if result is not None:
                 if "name" in result:
@@ -182,6 +408,12 @@ class ResPartner(models.Model):
                 new_vals["company_type"] = (
                     "company" if new_vals["is_company"] else "person"
                 )
+                if "l10n_do_fiscal_state" in result:
+                    new_vals["l10n_do_fiscal_state"] = result["l10n_do_fiscal_state"]
+                    new_vals["l10n_do_payment_regime"] = result.get(
+                        "l10n_do_payment_regime"
+                    )
+                    new_vals["l10n_do_fiscal_checked_on"] = fields.Datetime.now()
                 if not vals.get("phone"):
                     new_vals["phone"] = result.get("phone")
                 if not vals.get("street"):
@@ -190,8 +422,23 @@ class ResPartner(models.Model):
 
     @api.model_create_multi
     def create(self, vals_list):
+        partners = self
+        numbers = [
+            vat
+            for vat in map(self._get_vals_vat, vals_list)
+            if vat and str(vat).isdigit() and len(vat) in (9, 11)
+        ]
+        if numbers and self.env.user.company_id.l10_do_can_validate_rnc:
+            # Batch path: one duplicates query and concurrent requests for
+            # the whole batch, later validations are served from cache
+            self.with_context(model=self._name)._check_rnc_cedula_duplicates(numbers)
+            self.with_context(
+                l10n_do_service_priority="bulk" if len(numbers) > 1 else None
+            )._prefetch_contact_data(numbers)
+            partners = self.with_context(l10n_do_rnc_duplicates_checked=True)
+
         for vals in vals_list:
-            vals.update(self._get_updated_vals(vals))
+            vals.update(partners._get_updated_vals(vals))
         return super(ResPartner, self).create(vals_list)
 
     @api.model
@@ -200,11 +447,232 @@ class ResPartner(models.Model):
             return super(ResPartner, self).name_create(name)
         if self._rec_name:
             if name.isdigit():
-                partner = self.search([("vat", "=", name)])
-                if partner:
-                    return partner.name_get()[0]
-                else:
-                    new_partner = self.create({"vat": name})
-                    return new_partner.name_get()[0]
+                memo = self._l10n_do_vat_memo()
+                key = self._l10n_do_vat_memo_key(name)
+                if key not in memo:
+                    partner = self.search([("l10n_do_vat_digits", "=", name)])[:1]
+                    memo[key] = (partner or self.create({"vat": name})).id
+                return self.browse(memo[key]).name_get()[0]
             else:
                 return super(ResPartner, self).name_create(name)
+
+    @api.model
+    def _l10n_do_vat_memo(self):
+        """
+        :return: dict {memo key: partner id} of the current transaction,
+        dropped on commit or rollback
+        """
+        cr = self.env.cr
+        memo = _vat_memo.get(cr)
+        if memo is None:
+            memo = _vat_memo[cr] = {}
+            cr.postcommit.add(lambda: _vat_memo.pop(cr, None))
+            cr.postrollback.add(lambda: _vat_memo.pop(cr, None))
+        return memo
+
+    @api.model
+    def _l10n_do_vat_memo_key(self, vat):
+        return (self.env.uid, self.env.company.id, vat)
+
+    @api.model
+    def _l10n_do_prefetch_vat_partners(self, vats):
+        """
+        Resolve several RNC/Cédula for the coming name_create/name_search
+        calls of an import: existing contacts are found in one query and
+        remembered for the transaction, unknown numbers have their fiscal
+        data fetched in a single batch so the contacts created for them
+        don't wait on the network row by row.
+
+        :param vats: list of RNC/Cédula digits
+        """
+        memo = self._l10n_do_vat_memo()
+        vats = {vat for vat in vats if self._l10n_do_vat_memo_key(vat) not in memo}
+        if not vats:
+            return
+        for partner in self.search([("l10n_do_vat_digits", "in", list(vats))]):
+            memo.setdefault(
+                self._l10n_do_vat_memo_key(partner.l10n_do_vat_digits), partner.id
+            )
+        missing = [
+            vat for vat in vats if self._l10n_do_vat_memo_key(vat) not in memo
+        ]
+        if missing and self.env.user.company_id.l10_do_can_validate_rnc:
+            self.with_context(
+                l10n_do_service_priority="bulk"
+            )._prefetch_contact_data(missing)
+
+    @api.model
+    def _l10n_do_get_fiscal_status(self, data, dgii_data=None):
+        """
+        :param data: fiscal data shaped like get_contact_data() response
+        :param dgii_data: DGII data, used when data has no contact
+        :return: tuple (DGII status, payment regime) of a RNC/Cédula,
+        (False, False) when it is unknown
+        """
+        if data and data.get("data"):
+            contact = data["data"][0]
+            return contact.get("state") or False, contact.get("payment_regime") or False
+        if dgii_data:
+            return dgii_data.get("status") or False, (
+                dgii_data.get("payment_regime") or False
+            )
+        return False, False
+
+    @api.model
+    def l10n_do_replay_contact_data(self, date_from=None, date_to=None):
+        """
+        Refill the lookup cache and the contacts DGII status from the
+        responses journaled between two datetimes, without any network
+        call. Both are dated as the journaled response, and contacts or
+        cache entries checked after it are left untouched.
+
+        :return: number of RNC/Cédula replayed
+        """
+        Journal = self.env["l10n_do.external.service.journal"].sudo()
+        RncCache = self.env["l10n_do.rnc.cache"].sudo()
+        statuses = {}
+        responses = Journal._iter_responses("rnc", date_from, date_to)
+        for params, content, date in responses:
+            vat = params.get("rnc")
+            if not vat:
+                continue
+            try:
+                contact = decoders.decode_contact(content)
+            except decoders.DecodeError as e:
+                _logger.warning(e)
+                continue
+            data = dict(contact._asdict())
+            RncCache._store(vat, data, fetch_date=date)
+            if contact.data:
+                statuses[vat] = (
+                    contact.data[0].get("state") or False,
+                    contact.data[0].get("payment_regime") or False,
+                    date,
+                )
+
+        vats_by_status = {}
+        for vat, status in statuses.items():
+            vats_by_status.setdefault(status, []).append(vat)
+        for (state, regime, date), vats in vats_by_status.items():
+            # Contacts checked after the journaled response keep their status
+            self.sudo().search(
+                [
+                    ("l10n_do_vat_digits", "in", vats),
+                    ("parent_id", "=", False),
+                    "|",
+                    ("l10n_do_fiscal_checked_on", "=", False),
+                    ("l10n_do_fiscal_checked_on", "<", date),
+                ]
+            ).write(
+                {
+                    "l10n_do_fiscal_state": state,
+                    "l10n_do_payment_regime": regime,
+                    "l10n_do_fiscal_checked_on": date,
+                }
+            )
+        return len(statuses)
+
+    @api.model
+    def _cron_reverify_fiscal_status(self):
+        """
+        Refresh the DGII status and payment regime of contacts checked more
+        than rnc.reverify.max_age days ago. Contacts are walked by id in
+        chunks of rnc.reverify.batch_size, committing and saving the last
+        id in rnc.reverify.checkpoint after each one, so an interrupted or
+        time boxed run (rnc.reverify.max_duration minutes) resumes there.
+
+        Contacts whose lookup failed keep their status and check date, so
+        they are verified again by the next pass. A chunk whose lookups
+        all failed stops the run without moving the checkpoint.
+
+        Only shared contacts and the ones of companies allowed to validate
+        RNC are verified, nothing is when no company is.
+        """
+        company_ids = (
+            self.env["res.company"]
+            .sudo()
+            .search([("l10_do_can_validate_rnc", "=", True)])
+            .ids
+        )
+        if not company_ids:
+            return
+        ICP = self.env["ir.config_parameter"].sudo()
+        max_age = float(ICP.get_param("rnc.reverify.max_age", 30))
+        batch_size = int(ICP.get_param("rnc.reverify.batch_size", 500))
+        max_duration = float(ICP.get_param("rnc.reverify.max_duration", 360)) * 60
+        checkpoint = int(ICP.get_param("rnc.reverify.checkpoint", 0))
+
+        Partner = self.sudo().with_context(l10n_do_service_priority="bulk")
+        start = time.monotonic()
+        while time.monotonic() - start < max_duration:
+            limit = fields.Datetime.now() - timedelta(days=max_age)
+            Partner.flush(
+                [
+                    "parent_id",
+                    "company_id",
+                    "l10n_do_vat_digits",
+                    "l10n_do_fiscal_checked_on",
+                ]
+            )
+            self.env.cr.execute(
+                """
+                SELECT id, l10n_do_vat_digits
+                FROM res_partner
+                WHERE id > %s
+                AND parent_id IS NULL
+                AND (company_id IS NULL OR company_id IN %s)
+                AND length(l10n_do_vat_digits) IN (9, 11)
+                AND (l10n_do_fiscal_checked_on IS NULL
+                     OR l10n_do_fiscal_checked_on < %s)
+                ORDER BY id
+                LIMIT %s
+                """,
+                (checkpoint, tuple(company_ids), limit, batch_size),
+            )
+            rows = self.env.cr.fetchall()
+            if not rows:
+                # Pass completed, next run starts over
+                ICP.set_param("rnc.reverify.checkpoint", 0)
+                break
+
+            vats = list({vat for partner_id, vat in rows})
+            lookups = Partner._prefetch_contact_data(vats)
+            statuses = {
+                vat: Partner._l10n_do_get_fiscal_status(*lookup)
+                for vat, lookup in lookups.items()
+            }
+            if not statuses:
+                _logger.warning(
+                    "Fiscal status lookups failed for contacts after id %s, "
+                    "verification stopped",
+                    checkpoint,
+                )
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+                break
+
+            partner_ids_by_status = {}
+            for partner_id, vat in rows:
+                if vat in statuses:
+                    partner_ids_by_status.setdefault(statuses[vat], []).append(
+                        partner_id
+                    )
+            now = fields.Datetime.now()
+            for (state, regime), partner_ids in partner_ids_by_status.items():
+                Partner.browse(partner_ids).write(
+                    {
+                        "l10n_do_fiscal_state": state,
+                        "l10n_do_payment_regime": regime,
+                        "l10n_do_fiscal_checked_on": now,
+                    }
+                )
+
+            checkpoint = rows[-1][0]
+            ICP.set_param("rnc.reverify.checkpoint", checkpoint)
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            _logger.info(
+                "Fiscal status of %s contacts verified, %s lookups failed, "
+                "up to id %s",
+                len(rows),
+                len(vats) - len(statuses),
+                checkpoint,
+            )
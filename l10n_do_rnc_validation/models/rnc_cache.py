@@ -0,0 +1,197 @@
+import json
+import logging
+import threading
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools.lru import LRU
+
+_logger = logging.getLogger(__name__)
+
+# Per-worker in-memory front of the lookup table, keyed by
+# (dbname, source, vat) and holding (expiration datetime, data) tuples
+_memory_cache = LRU(4096)
+
+_stats_lock = threading.Lock()
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+class RncCache(models.Model):
+    _name = "l10n_do.rnc.cache"
+    _description = "RNC/Cédula Lookup Cache"
+    _rec_name = "vat"
+    _order = "fetch_date desc"
+
+    vat = fields.Char("RNC/Cédula", required=True, readonly=True)
+    source = fields.Selection(
+        [("indexa", "Indexa API"), ("dgii", "DGII")],
+        required=True,
+        default="indexa",
+        readonly=True,
+    )
+    data = fields.Text(readonly=True)
+    found = fields.Boolean(readonly=True)
+    fetch_date = fields.Datetime(required=True, index=True, readonly=True)
+
+    _sql_constraints = [
+        (
+            "vat_source_uniq",
+            "unique(vat, source)",
+            "A RNC/Cédula can only be cached once per source.",
+        ),
+    ]
+
+    @api.model
+    def _get_ttl(self, found):
+        """
+        Lifetime of a cached lookup. Negative results (numbers the
+        service doesn't know about) are kept for a shorter period.
+        """
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        if found:
+            hours = get_param("rnc.indexa.cache.ttl", 168)
+        else:
+            hours = get_param("rnc.indexa.cache.negative_ttl", 12)
+        return timedelta(hours=float(hours))
+
+    @api.model
+    def _lookup(self, vat, source="indexa"):
+        """
+        Look a RNC/Cédula up in the in-memory cache first, then in the
+        database table.
+
+        :param vat: string representation of contact tax id
+        :param source: external source the data was fetched from
+        :return: tuple (hit, data). data is the cached service response
+        """
+        key = (self.env.cr.dbname, source, vat)
+        now = fields.Datetime.now()
+        ExternalService = self.env["l10n_do.external.service"]
+        service = "rnc" if source == "indexa" else source
+
+        entry = _memory_cache.get(key)
+        if entry:
+            expiration, data = entry
+            if expiration > now:
+                _count("memory_hits")
+                ExternalService._record_cache_lookups(service, hits=1)
+                return True, data
+            _memory_cache.pop(key)
+
+        self.env.cr.execute(
+            """
+            SELECT data, found, fetch_date
+            FROM l10n_do_rnc_cache
+            WHERE vat = %s AND source = %s
+            """,
+            (vat, source),
+        )
+        row = self.env.cr.fetchone()
+        if row:
+            data, found, fetch_date = row
+            expiration = fetch_date + self._get_ttl(found)
+            if expiration > now:
+                data = json.loads(data) if data else data
+                _memory_cache[key] = (expiration, data)
+                _count("db_hits")
+                ExternalService._record_cache_lookups(service, hits=1)
+                return True, data
+
+        _count("misses")
+        ExternalService._record_cache_lookups(service, misses=1)
+        return False, None
+
+    @api.model
+    def _store(self, vat, data, source="indexa", fetch_date=None):
+        """
+        Save a service response into both cache levels. Falsy responses
+        and responses with empty data are cached as negative results.
+
+        :param fetch_date: datetime the response was received, now by
+        default. An entry fetched later than it is kept.
+        """
+        found = bool(data.get("data") if source == "indexa" else data)
+        now = fields.Datetime.now()
+        fetch_date = fetch_date or now
+        self.env.cr.execute(
+            """
+            INSERT INTO l10n_do_rnc_cache AS cache (
+                vat, source, data, found, fetch_date,
+                create_uid, create_date, write_uid, write_date
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (vat, source) DO UPDATE
+            SET data = EXCLUDED.data,
+                found = EXCLUDED.found,
+                fetch_date = EXCLUDED.fetch_date,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            WHERE cache.fetch_date <= EXCLUDED.fetch_date
+            """,
+            (
+                vat,
+                source,
+                json.dumps(data) if data else None,
+                found,
+                fetch_date,
+                self.env.uid,
+                now,
+                self.env.uid,
+                now,
+            ),
+        )
+        expiration = fetch_date + self._get_ttl(found)
+        if self.env.cr.rowcount and expiration > now:
+            _memory_cache[(self.env.cr.dbname, source, vat)] = (expiration, data)
+
+    @api.model
+    def get_cache_stats(self):
+        """
+        :return: dict with this worker hit/miss counters and cache sizes
+        """
+        with _stats_lock:
+            stats = dict(_stats)
+        stats["memory_size"] = len(_memory_cache)
+        stats["db_size"] = self.sudo().search_count([])
+        return stats
+
+    @api.autovacuum
+    def _gc_rnc_cache(self):
+        """Drop expired lookups and keep the table under its size limit."""
+        now = fields.Datetime.now()
+        self.env.cr.execute(
+            """
+            DELETE FROM l10n_do_rnc_cache
+            WHERE (found AND fetch_date < %s)
+            OR (NOT found AND fetch_date < %s)
+            """,
+            (now - self._get_ttl(True), now - self._get_ttl(False)),
+        )
+        _logger.info("Removed %s expired RNC lookups", self.env.cr.rowcount)
+
+        max_size = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("rnc.indexa.cache.max_size", 100000)
+        )
+        self.env.cr.execute(
+            """
+            DELETE FROM l10n_do_rnc_cache
+            WHERE id IN (
+                SELECT id FROM l10n_do_rnc_cache
+                ORDER BY fetch_date DESC
+                OFFSET %s
+            )
+            """,
+            (max_size,),
+        )
+        if self.env.cr.rowcount:
+            _logger.info(
+                "Evicted %s RNC lookups over the cache size limit",
+                self.env.cr.rowcount,
+            )
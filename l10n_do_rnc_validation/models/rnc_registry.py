@@ -0,0 +1,179 @@
+import io
+import logging
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+
+import requests
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+REGISTRY_BATCH_SIZE = 5000
+
+
+def _parse_registry_date(value):
+    try:
+        return datetime.strptime(value, "%d/%m/%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def _iter_registry_rows(registry_file):
+    """
+    Stream the rows of the DGII contributors registry zip file. Each line
+    of its text member looks like:
+    RNC|BUSINESS NAME|TRADENAME|ECONOMIC ACTIVITY|||||DATE|STATE|PAYMENT REGIME
+    """
+    with zipfile.ZipFile(registry_file) as archive:
+        member = next(
+            name for name in archive.namelist() if name.upper().endswith(".TXT")
+        )
+        with archive.open(member) as raw:
+            for line in io.TextIOWrapper(raw, encoding="latin-1", errors="replace"):
+                values = [value.strip() for value in line.split("|")]
+                if len(values) < 11 or not values[0].isdigit():
+                    continue
+                yield (
+                    values[0],
+                    values[1],
+                    values[2],
+                    values[3],
+                    _parse_registry_date(values[8]),
+                    values[9],
+                    values[10],
+                )
+
+
+class RncRegistry(models.Model):
+    _name = "l10n_do.rnc.registry"
+    _description = "DGII Contributors Registry"
+    _rec_name = "vat"
+    _order = "vat"
+
+    vat = fields.Char("RNC/Cédula", required=True, readonly=True)
+    business_name = fields.Char(readonly=True)
+    tradename = fields.Char(readonly=True)
+    economic_activity = fields.Char(readonly=True)
+    constitution_date = fields.Date(readonly=True)
+    state = fields.Char(readonly=True)
+    payment_regime = fields.Char(readonly=True)
+    sync_date = fields.Datetime(required=True, index=True, readonly=True)
+
+    _sql_constraints = [
+        ("vat_uniq", "unique(vat)", "A RNC/Cédula can only be registered once."),
+    ]
+
+    @api.model
+    def _lookup_many(self, vats):
+        """
+        Resolve RNC/Cédula from the local registry copy, ignoring rows
+        older than rnc.dgii.registry.max_age days.
+
+        :param vats: list of RNC/Cédula
+        :return: dict {vat: data shaped like get_contact_data() response}
+        """
+        if not vats:
+            return {}
+        max_age = float(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("rnc.dgii.registry.max_age", 8)
+        )
+        self.env.cr.execute(
+            """
+            SELECT vat, business_name, tradename, economic_activity,
+                   constitution_date, state, payment_regime
+            FROM l10n_do_rnc_registry
+            WHERE vat IN %s AND sync_date >= %s
+            """,
+            (tuple(vats), fields.Datetime.now() - timedelta(days=max_age)),
+        )
+        result = {}
+        for row in self.env.cr.dictfetchall():
+            vat = row.pop("vat")
+            row["rnc"] = vat
+            row["constitution_date"] = fields.Date.to_string(row["constitution_date"])
+            result[vat] = {"status": "success", "data": [row]}
+        return result
+
+    @api.model
+    def _lookup(self, vat):
+        return self._lookup_many([vat]).get(vat)
+
+    @api.model
+    def _cron_sync_registry(self):
+        """
+        Download the DGII contributors registry and stream it into the
+        local table in batches, committing after each one. Contributors no
+        longer present in the file are removed once the load completes.
+        """
+        url = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("rnc.dgii.registry.url")
+        )
+        client = self.env["l10n_do.external.service"]._get_http_client("dgii")
+        start = fields.Datetime.now()
+
+        with tempfile.TemporaryFile() as registry_file:
+            _logger.info("Downloading DGII contributors registry from %s", url)
+            try:
+                with client.get(url, stream=True) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        registry_file.write(chunk)
+            except requests.exceptions.RequestException as e:
+                _logger.warning("Unable to download DGII registry: %s", e)
+                return False
+            registry_file.seek(0)
+
+            count = 0
+            rows = _iter_registry_rows(registry_file)
+            for batch in split_every(REGISTRY_BATCH_SIZE, rows):
+                # The file may repeat a number, keep its last occurrence
+                batch = {row[0]: row for row in batch}.values()
+                execute_values(
+                    self.env.cr._obj,
+                    """
+                    INSERT INTO l10n_do_rnc_registry (
+                        vat, business_name, tradename, economic_activity,
+                        constitution_date, state, payment_regime, sync_date,
+                        create_uid, create_date, write_uid, write_date
+                    )
+                    VALUES %s
+                    ON CONFLICT (vat) DO UPDATE
+                    SET business_name = EXCLUDED.business_name,
+                        tradename = EXCLUDED.tradename,
+                        economic_activity = EXCLUDED.economic_activity,
+                        constitution_date = EXCLUDED.constitution_date,
+                        state = EXCLUDED.state,
+                        payment_regime = EXCLUDED.payment_regime,
+                        sync_date = EXCLUDED.sync_date,
+                        write_uid = EXCLUDED.write_uid,
+                        write_date = EXCLUDED.write_date
+                    """,
+                    [
+                        row + (start, self.env.uid, start, self.env.uid, start)
+                        for row in batch
+                    ],
+                )
+                count += len(batch)
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+
+        if not count:
+            _logger.warning("DGII registry file has no contributors, sync skipped")
+            return False
+
+        self.env.cr.execute(
+            "DELETE FROM l10n_do_rnc_registry WHERE sync_date < %s", (start,)
+        )
+        _logger.info(
+            "DGII registry synced: %s contributors, %s removed",
+            count,
+            self.env.cr.rowcount,
+        )
+        return True
@@ -0,0 +1,105 @@
+odoo.define("l10n_do_rnc_validation.vat_field", function (require) {
+    "use strict";
+
+    const basicFields = require("web.basic_fields");
+    const fieldRegistry = require("web.field_registry");
+
+    /**
+     * RNC/Cédula input filling the partner fiscal data while the user types,
+     * without waiting for the form to be saved.
+     */
+    const VatField = basicFields.FieldChar.extend({
+        lookupDelay: 400,
+
+        /**
+         * @override
+         */
+        init: function () {
+            this._super.apply(this, arguments);
+            this.lastLookup = null;
+            this._debouncedLookup = _.debounce(
+                this._lookupFiscalData.bind(this),
+                this.lookupDelay
+            );
+        },
+
+        //--------------------------------------------------------------------------
+        // Private
+        //--------------------------------------------------------------------------
+
+        /**
+         * @private
+         * @param {string} value
+         * @returns {Promise}
+         */
+        _lookupFiscalData: function (value) {
+            const vat = (value || "").replace(/[^0-9]/g, "");
+            if (![9, 11].includes(vat.length) || vat === this.lastLookup) {
+                return Promise.resolve();
+            }
+            this.lastLookup = vat;
+            return this._rpc({
+                route: "/l10n_do_rnc_validation/contact_data",
+                params: {vat: vat, partner_id: this.res_id || null},
+            }).then((result) => {
+                if (this.isDestroyed() || vat !== this.lastLookup) {
+                    return;
+                }
+                if (result.warning) {
+                    this.displayNotification({
+                        type: "warning",
+                        message: result.warning,
+                    });
+                }
+                if (result.values) {
+                    this._applyFiscalData(result.values);
+                }
+            });
+        },
+        /**
+         * Fill the empty partner fields with the fiscal data. The name is
+         * replaced too when it is empty or the RNC/Cédula itself.
+         *
+         * @private
+         * @param {Object} values
+         */
+        _applyFiscalData: function (values) {
+            const data = this.record.data;
+            const changes = {};
+            if (values.name && (!data.name || /^[0-9-]+$/.test(data.name))) {
+                changes.name = values.name;
+            }
+            for (const fieldName of ["ref", "street", "phone"]) {
+                if (values[fieldName] && fieldName in data && !data[fieldName]) {
+                    changes[fieldName] = values[fieldName];
+                }
+            }
+            if ("is_company" in values && "company_type" in data) {
+                changes.company_type = values.is_company ? "company" : "person";
+            }
+            if (!_.isEmpty(changes)) {
+                this.trigger_up("field_changed", {
+                    dataPointID: this.dataPointID,
+                    changes: changes,
+                });
+            }
+        },
+
+        //--------------------------------------------------------------------------
+        // Handlers
+        //--------------------------------------------------------------------------
+
+        /**
+         * @override
+         * @private
+         */
+        _onInput: function () {
+            this._super.apply(this, arguments);
+            this._debouncedLookup(this.$input.val());
+        },
+    });
+
+    fieldRegistry.add("l10n_do_vat", VatField);
+
+    return VatField;
+});
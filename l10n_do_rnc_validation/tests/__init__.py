@@ -0,0 +1,6 @@
+from . import test_benchmark
+from . import test_name_search
+from . import test_registry
+from . import test_replay
+from . import test_reverify
+from . import test_rnc_cache
@@ -0,0 +1,39 @@
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.l10n_do_external_service.tests.common import MockServiceCase
+
+from ..models import rnc_cache
+
+from stdnum.do import rnc
+
+
+@tagged("post_install", "-at_install", "-standard", "benchmark")
+class PartnerImportBenchmark(MockServiceCase, TransactionCase):
+    mock_latency = 0.02
+
+    def setUp(self):
+        super(PartnerImportBenchmark, self).setUp()
+        rnc_cache._memory_cache.clear()
+        self.env.user.company_id.l10_do_can_validate_rnc = True
+
+    def _get_vats(self, count):
+        vats = []
+        for i in range(count):
+            number = "4%07d" % (9000000 + i)
+            vats.append(number + rnc.calc_check_digit(number))
+        return vats
+
+    def test_001_partner_import(self):
+        vats = self._get_vats(200)
+        with self.benchmark("partner import", len(vats)) as stats:
+            partners = self.env["res.partner"].create([{"vat": vat} for vat in vats])
+
+        self.assertEqual(len(partners), len(vats))
+        self.assertEqual(partners[0].name, "CONTRIBUYENTE %s SRL" % vats[0])
+        self.assertEqual(stats["http_calls"].get("rnc"), len(vats))
+
+        # Same numbers are served from the lookup cache
+        partners.unlink()
+        with self.benchmark("partner reimport", len(vats)) as stats:
+            self.env["res.partner"].create([{"vat": vat} for vat in vats])
+        self.assertFalse(stats["http_calls"])
@@ -0,0 +1,26 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class PartnerNameSearchTest(TransactionCase):
+    def setUp(self):
+        super(PartnerNameSearchTest, self).setUp()
+        self.env.user.company_id.l10_do_can_validate_rnc = False
+        self.partner = self.env["res.partner"].create(
+            {"name": "Name Search Partner", "vat": "131793916"}
+        )
+
+    def _search_ids(self, name):
+        return [
+            partner_id
+            for partner_id, name in self.env["res.partner"].name_search(name)
+        ]
+
+    def test_001_vat_search(self):
+        self.assertIn(self.partner.id, self._search_ids("131-79391-6"))
+        self.assertIn(self.partner.id, self._search_ids("79391"))
+
+    def test_002_not_a_vat(self):
+        # Text containing digits isn't searched as a VAT
+        self.assertFalse(self._search_ids("Acme 1"))
+        self.assertFalse(self._search_ids("Acme 13179"))
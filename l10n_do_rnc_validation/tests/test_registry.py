@@ -0,0 +1,111 @@
+import io
+import zipfile
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from ..models.rnc_registry import _iter_registry_rows
+
+REGISTRY_LINES = [
+    "RNC|RAZON SOCIAL|NOMBRE COMERCIAL|ACTIVIDAD|||||FECHA|ESTADO|REGIMEN",
+    "401000011|COMPAÑIA UNO SRL|UNO|VENTA DE SOFTWARE|||||20/07/2018|ACTIVO|NORMAL",
+    "401000012|COMPAÑIA DOS SRL||SERVICIOS|||||no date|SUSPENDIDO|NORMAL",
+    "401000013|TRUNCATED|LINE",
+    "401000012|COMPAÑIA DOS SRL|DOS|SERVICIOS|||||01/02/2020|ACTIVO|RST",
+]
+
+
+def _registry_zip(lines):
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as archive:
+        archive.writestr("README.md", "Not the registry")
+        archive.writestr("TMP/DGII_RNC.TXT", "\r\n".join(lines).encode("latin-1"))
+    return content.getvalue()
+
+
+@tagged("post_install", "-at_install")
+class RncRegistryTest(TransactionCase):
+    def setUp(self):
+        super(RncRegistryTest, self).setUp()
+        self.Registry = self.env["l10n_do.rnc.registry"]
+        self.env.cr.execute("DELETE FROM l10n_do_rnc_registry")
+
+    def _sync(self, content):
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [content[:100], content[100:]]
+        client = MagicMock()
+        client.get.return_value = response
+        with patch.object(
+            type(self.env["l10n_do.external.service"]),
+            "_get_http_client",
+            return_value=client,
+        ), patch.object(type(self.env.cr), "commit"):
+            return self.Registry._cron_sync_registry()
+
+    def test_001_parse_rows(self):
+        rows = list(_iter_registry_rows(io.BytesIO(_registry_zip(REGISTRY_LINES))))
+        self.assertEqual(
+            rows,
+            [
+                (
+                    "401000011",
+                    "COMPAÑIA UNO SRL",
+                    "UNO",
+                    "VENTA DE SOFTWARE",
+                    "2018-07-20",
+                    "ACTIVO",
+                    "NORMAL",
+                ),
+                (
+                    "401000012",
+                    "COMPAÑIA DOS SRL",
+                    "",
+                    "SERVICIOS",
+                    None,
+                    "SUSPENDIDO",
+                    "NORMAL",
+                ),
+                (
+                    "401000012",
+                    "COMPAÑIA DOS SRL",
+                    "DOS",
+                    "SERVICIOS",
+                    "2020-02-01",
+                    "ACTIVO",
+                    "RST",
+                ),
+            ],
+        )
+
+    def test_002_sync_upsert(self):
+        """Rows are upserted and contributors missing from the file removed"""
+        self.env.cr.execute(
+            """
+            INSERT INTO l10n_do_rnc_registry (vat, business_name, state, sync_date)
+            VALUES ('401000011', 'OLD NAME', 'SUSPENDIDO', %s),
+                   ('401000099', 'GONE SRL', 'ACTIVO', %s)
+            """,
+            (fields.Datetime.now() - timedelta(days=7),) * 2,
+        )
+        self.assertTrue(self._sync(_registry_zip(REGISTRY_LINES)))
+        self.assertEqual(
+            self.Registry.search([]).mapped("vat"), ["401000011", "401000012"]
+        )
+
+        data = self.Registry._lookup("401000011")["data"][0]
+        self.assertEqual(data["business_name"], "COMPAÑIA UNO SRL")
+        self.assertEqual(data["state"], "ACTIVO")
+        self.assertEqual(data["constitution_date"], "2018-07-20")
+        # A repeated number keeps its last occurrence
+        data = self.Registry._lookup("401000012")["data"][0]
+        self.assertEqual(data["tradename"], "DOS")
+        self.assertEqual(data["payment_regime"], "RST")
+
+    def test_003_sync_empty_file(self):
+        """An empty file doesn't remove the current contributors"""
+        self.assertTrue(self._sync(_registry_zip(REGISTRY_LINES)))
+        self.assertFalse(self._sync(_registry_zip(REGISTRY_LINES[:1])))
+        self.assertEqual(len(self.Registry.search([])), 2)
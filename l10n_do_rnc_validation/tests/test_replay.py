@@ -0,0 +1,85 @@
+import json
+import zlib
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+VAT = "131793916"
+
+
+@tagged("post_install", "-at_install")
+class ContactDataReplayTest(TransactionCase):
+    def setUp(self):
+        super(ContactDataReplayTest, self).setUp()
+        self.env.user.company_id.l10_do_can_validate_rnc = False
+        self.partner = self.env["res.partner"].create(
+            {"name": "Replayed Partner", "vat": VAT}
+        )
+        self.RncCache = self.env["l10n_do.rnc.cache"]
+        self.env.cr.execute("DELETE FROM l10n_do_rnc_cache WHERE vat = %s", (VAT,))
+
+    def _journal_response(self, date, state):
+        content = json.dumps(
+            {
+                "status": "success",
+                "data": [
+                    {
+                        "rnc": VAT,
+                        "business_name": "REPLAYED PARTNER SRL",
+                        "state": state,
+                        "payment_regime": "NORMAL",
+                    }
+                ],
+            }
+        ).encode()
+        self.env["l10n_do.external.service.journal"]._add(
+            [
+                (
+                    date,
+                    "rnc",
+                    self.env.company.id,
+                    "https://example.com/rnc",
+                    json.dumps({"rnc": VAT}),
+                    "200",
+                    0.1,
+                    len(content),
+                    zlib.compress(content),
+                )
+            ]
+        )
+
+    def _replay(self, date):
+        # Only the entry of the test, not the ones journaled by other tests
+        return self.env["res.partner"].l10n_do_replay_contact_data(
+            date - timedelta(hours=1), date + timedelta(hours=1)
+        )
+
+    def _cache_fetch_date(self):
+        return self.RncCache.search([("vat", "=", VAT)]).fetch_date
+
+    def test_001_replay_dated(self):
+        """Replayed responses keep the date they were received on"""
+        date = fields.Datetime.now() - timedelta(days=2)
+        self._journal_response(date, "SUSPENDIDO")
+        self.assertEqual(self._replay(date), 1)
+        self.assertEqual(self.partner.l10n_do_fiscal_state, "SUSPENDIDO")
+        self.assertEqual(self.partner.l10n_do_fiscal_checked_on, date)
+        self.assertEqual(self._cache_fetch_date(), date)
+        hit, data = self.RncCache._lookup(VAT)
+        self.assertTrue(hit)
+        self.assertEqual(data["data"][0]["state"], "SUSPENDIDO")
+
+    def test_002_replay_older_than_current(self):
+        """Responses journaled before the last check don't overwrite it"""
+        now = fields.Datetime.now()
+        self.partner.write(
+            {"l10n_do_fiscal_state": "ACTIVO", "l10n_do_fiscal_checked_on": now}
+        )
+        self.RncCache._store(VAT, {"status": "success", "data": [{"rnc": VAT}]})
+        date = now - timedelta(days=2)
+        self._journal_response(date, "SUSPENDIDO")
+        self._replay(date)
+        self.assertEqual(self.partner.l10n_do_fiscal_state, "ACTIVO")
+        self.assertEqual(self.partner.l10n_do_fiscal_checked_on, now)
+        self.assertEqual(self._cache_fetch_date(), now)
@@ -0,0 +1,76 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.l10n_do_external_service.tests.common import (
+    MockServiceCase,
+    mock_rnc,
+)
+
+from ..models import res_partner, rnc_cache
+
+VATS = ("401000001", "401000002", "401000003")
+
+
+@tagged("post_install", "-at_install")
+class ReverifyFiscalStatusTest(MockServiceCase, TransactionCase):
+    def setUp(self):
+        super(ReverifyFiscalStatusTest, self).setUp()
+        self.env.company.l10_do_can_validate_rnc = False
+        self.partners = self.env["res.partner"].create(
+            [{"name": "Reverified %s" % vat, "vat": vat} for vat in VATS]
+        )
+        self.env.company.l10_do_can_validate_rnc = True
+        self.env.cr.execute("DELETE FROM l10n_do_rnc_cache WHERE vat IN %s", (VATS,))
+        rnc_cache._memory_cache.clear()
+        self.mock_server.reset()
+        self.ICP = self.env["ir.config_parameter"].sudo()
+        # Contacts created before the test ones aren't verified
+        self.ICP.set_param("rnc.reverify.checkpoint", self.partners[0].id - 1)
+        self.ICP.set_param("rnc.reverify.batch_size", 2)
+        self.addCleanup(self.mock_server.routes.__setitem__, "rnc", mock_rnc)
+        for patcher in (
+            patch.object(type(self.env.cr), "commit"),
+            patch.object(
+                res_partner, "_request_dgii_data", return_value=(False, False)
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _run(self):
+        self.env["res.partner"]._cron_reverify_fiscal_status()
+        self.partners.invalidate_cache()
+
+    def test_001_checkpoint_resume(self):
+        """An interrupted run resumes after the last verified chunk"""
+
+        def failing_rnc(params):
+            if params.get("rnc") == VATS[2]:
+                return 500, {"status": "error", "message": "Unavailable"}
+            return mock_rnc(params)
+
+        self.mock_server.routes["rnc"] = failing_rnc
+        self._run()
+        self.assertEqual(
+            self.partners[:2].mapped("l10n_do_fiscal_state"), ["ACTIVO"] * 2
+        )
+        self.assertFalse(self.partners[2].l10n_do_fiscal_checked_on)
+        self.assertEqual(
+            int(self.ICP.get_param("rnc.reverify.checkpoint")), self.partners[1].id
+        )
+
+        self.mock_server.routes["rnc"] = mock_rnc
+        self.mock_server.reset()
+        self._run()
+        self.assertEqual(self.partners[2].l10n_do_fiscal_state, "ACTIVO")
+        self.assertEqual(self.mock_server.calls["rnc"], 1)
+        # Pass completed, the next run starts over
+        self.assertEqual(int(self.ICP.get_param("rnc.reverify.checkpoint")), 0)
+
+    def test_002_validation_disabled(self):
+        """Nothing is verified while no company can validate RNC"""
+        self.env["res.company"].search([]).l10_do_can_validate_rnc = False
+        self._run()
+        self.assertFalse(any(self.partners.mapped("l10n_do_fiscal_checked_on")))
+        self.assertEqual(self.mock_server.calls["rnc"], 0)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from ..models import rnc_cache
+
+FOUND = {"status": "success", "data": [{"rnc": "401000021", "state": "ACTIVO"}]}
+NOT_FOUND = {"status": "success", "data": []}
+
+
+@tagged("post_install", "-at_install")
+class RncCacheTest(TransactionCase):
+    def setUp(self):
+        super(RncCacheTest, self).setUp()
+        self.RncCache = self.env["l10n_do.rnc.cache"]
+        self.env.cr.execute("DELETE FROM l10n_do_rnc_cache")
+        rnc_cache._memory_cache.clear()
+        set_param = self.env["ir.config_parameter"].sudo().set_param
+        set_param("rnc.indexa.cache.ttl", 168)
+        set_param("rnc.indexa.cache.negative_ttl", 12)
+
+    def _store(self, vat, data, hours_ago):
+        fetch_date = fields.Datetime.now() - timedelta(hours=hours_ago)
+        self.RncCache._store(vat, data, fetch_date=fetch_date)
+
+    def _stats_delta(self, before):
+        after = self.RncCache.get_cache_stats()
+        return {key: after[key] - before[key] for key in rnc_cache._stats}
+
+    def test_001_expiry(self):
+        """Lookups are served until their TTL, from memory once read"""
+        self._store("401000021", FOUND, hours_ago=6 * 24)
+        self._store("401000022", FOUND, hours_ago=8 * 24)
+        rnc_cache._memory_cache.clear()
+
+        stats = self.RncCache.get_cache_stats()
+        self.assertEqual(self.RncCache._lookup("401000021"), (True, FOUND))
+        self.assertEqual(self.RncCache._lookup("401000021"), (True, FOUND))
+        self.assertEqual(self.RncCache._lookup("401000022"), (False, None))
+        self.assertEqual(
+            self._stats_delta(stats), {"memory_hits": 1, "db_hits": 1, "misses": 1}
+        )
+
+        # An expired memory entry is dropped, the table is looked up again
+        key = (self.env.cr.dbname, "indexa", "401000021")
+        rnc_cache._memory_cache[key] = (fields.Datetime.now(), FOUND)
+        stats = self.RncCache.get_cache_stats()
+        self.assertEqual(self.RncCache._lookup("401000021"), (True, FOUND))
+        self.assertEqual(self._stats_delta(stats)["db_hits"], 1)
+
+    def test_002_negative_cache(self):
+        """Numbers the service doesn't know are cached for a shorter time"""
+        self._store("401000023", NOT_FOUND, hours_ago=6)
+        self._store("401000024", NOT_FOUND, hours_ago=13)
+        self._store("401000025", FOUND, hours_ago=13)
+
+        self.assertEqual(self.RncCache._lookup("401000023"), (True, NOT_FOUND))
+        self.assertEqual(self.RncCache._lookup("401000024"), (False, None))
+        self.assertEqual(self.RncCache._lookup("401000025"), (True, FOUND))
+        rnc_cache._memory_cache.clear()
+        self.assertEqual(self.RncCache._lookup("401000023"), (True, NOT_FOUND))
+
+    def test_003_gc(self):
+        """Garbage collection only removes expired lookups"""
+        self._store("401000023", NOT_FOUND, hours_ago=6)
+        self._store("401000024", NOT_FOUND, hours_ago=13)
+        self._store("401000025", FOUND, hours_ago=13)
+        self._store("401000026", FOUND, hours_ago=8 * 24)
+        self.RncCache._gc_rnc_cache()
+        self.assertEqual(
+            sorted(self.RncCache.search([]).mapped("vat")), ["401000023", "401000025"]
+        )
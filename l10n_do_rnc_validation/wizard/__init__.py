@@ -0,0 +1 @@
+from . import vat_duplicate_audit
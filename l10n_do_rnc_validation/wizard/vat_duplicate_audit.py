@@ -0,0 +1,134 @@
+from odoo import models, fields, api, _
+
+
+class VatDuplicateAudit(models.TransientModel):
+    _name = "l10n_do.vat.duplicate.audit"
+    _description = "RNC/Cédula Duplicates Audit"
+
+    per_company = fields.Boolean(
+        readonly=True,
+        help="Contacts aren't shared between companies, so duplicates are "
+        "grouped per company.",
+    )
+    line_ids = fields.One2many(
+        "l10n_do.vat.duplicate.audit.line", "audit_id", readonly=True
+    )
+    group_count = fields.Integer("Duplicated Numbers", readonly=True)
+    partner_count = fields.Integer("Contacts Involved", readonly=True)
+
+    @api.model
+    def _query_duplicates(self, per_company):
+        """
+        Normalize every main contact Tax ID and group them in a single
+        query. Separators are dropped and missing leading zeros restored:
+        numbers shorter than a RNC are padded to 9 digits and 10 digits
+        numbers to a 11 digits Cédula.
+
+        :return: list of tuples (vat, company_id, partner ids)
+        """
+        company_column = "company_id" if per_company else "NULL::integer"
+        company_filter = ""
+        params = []
+        if per_company:
+            company_filter = "AND (company_id IS NULL OR company_id IN %s)"
+            params.append(tuple(self.env.companies.ids))
+        self.env.cr.execute(
+            """
+            WITH normalized AS (
+                SELECT id, company_id,
+                       CASE
+                           WHEN length(digits) < 9 THEN lpad(digits, 9, '0')
+                           WHEN length(digits) = 10 THEN lpad(digits, 11, '0')
+                           ELSE digits
+                       END AS vat
+                FROM (
+                    SELECT id, company_id,
+                           regexp_replace(vat, '[^0-9]', '', 'g') AS digits
+                    FROM res_partner
+                    WHERE vat IS NOT NULL
+                    AND active
+                    AND parent_id IS NULL
+                    {company_filter}
+                ) partner
+                WHERE digits <> ''
+            )
+            SELECT vat, {company_column}, array_agg(id ORDER BY id)
+            FROM normalized
+            GROUP BY vat, {company_column}
+            HAVING count(*) > 1
+            ORDER BY count(*) DESC, vat
+            """.format(
+                company_column=company_column, company_filter=company_filter
+            ),
+            params,
+        )
+        return self.env.cr.fetchall()
+
+    def action_run(self):
+        self.ensure_one()
+        per_company = self.sudo().env.ref("base.res_partner_rule").active
+        duplicates = self._query_duplicates(per_company)
+        self.line_ids.unlink()
+        self.write(
+            {
+                "per_company": per_company,
+                "group_count": len(duplicates),
+                "partner_count": sum(len(ids) for vat, company, ids in duplicates),
+                "line_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "vat": vat,
+                            "company_id": company_id,
+                            "partner_ids": [(6, 0, partner_ids)],
+                        },
+                    )
+                    for vat, company_id, partner_ids in duplicates
+                ],
+            }
+        )
+        return {
+            "type": "ir.actions.act_window",
+            "name": _("RNC/Cédula Duplicates"),
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+        }
+
+
+class VatDuplicateAuditLine(models.TransientModel):
+    _name = "l10n_do.vat.duplicate.audit.line"
+    _description = "RNC/Cédula Duplicates Audit Line"
+    _order = "partner_count desc, vat"
+
+    audit_id = fields.Many2one(
+        "l10n_do.vat.duplicate.audit", required=True, ondelete="cascade"
+    )
+    vat = fields.Char("RNC/Cédula", readonly=True)
+    company_id = fields.Many2one("res.company", readonly=True)
+    partner_ids = fields.Many2many("res.partner", string="Contacts", readonly=True)
+    partner_count = fields.Integer(
+        "Contacts Count", compute="_compute_partner_count", store=True
+    )
+
+    @api.depends("partner_ids")
+    def _compute_partner_count(self):
+        for line in self:
+            line.partner_count = len(line.partner_ids)
+
+    def action_merge(self):
+        """Open the contacts merge wizard on this line contacts."""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "name": _("Merge Contacts"),
+            "res_model": "base.partner.merge.automatic.wizard",
+            "view_mode": "form",
+            "target": "new",
+            "context": {
+                "active_model": "res.partner",
+                "active_ids": self.partner_ids.ids,
+            },
+        }